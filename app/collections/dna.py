@@ -1,32 +1,133 @@
+import hashlib
+import json
+from itertools import islice
 from operator import attrgetter
-from typing import Collection, Dict, Iterator, List, Optional
+from typing import (
+    AsyncIterator,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
 
-from sqlalchemy import DateTime, Table, column, func, select, values
-from sqlalchemy.dialects.postgresql import insert
+from pydantic import BaseModel
+
+from sqlalchemy import (
+    CTE,
+    Alias,
+    ColumnElement,
+    Connection,
+    DateTime,
+    FromClause,
+    Integer,
+    LargeBinary,
+    Lateral,
+    Row,
+    Select,
+    Table,
+    and_,
+    case,
+    cast,
+    column,
+    delete,
+    exists,
+    func,
+    intersect,
+    literal,
+    null,
+    or_,
+    select,
+    true,
+    union,
+    union_all,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert
 
 from app.collections.user import UserCollection
-from app.collections.utils import as_records
-from app.models.dna import DNASequence
-from app.services.db import DBService
+from app.collections.utils import AsyncCollection, as_records
+from app.config import Config
+from app.models.dna import (
+    DNASequence,
+    DNASequenceHit,
+    DNASequenceHitMatch,
+    DNASequenceMatch,
+    DNASequencePatternHits,
+    DNASequenceSearchResult,
+    SearchEngine,
+    Strand,
+)
+from app.models.user import User
+from app.search import approximate, iupac, kmer, multi
+from app.search import regex as search_regex
+from app.search.regex import And, CompiledRegex, Factors, Or, simplify
+from app.services import metrics, packing
+from app.services.cache import CacheService
+from app.services.db import AsyncDBService, DBService
 
 dna_sequence: Table = DBService.dna_sequence
 dna_batch: Table = DBService.dna_batch
+dna_generation: Table = DBService.dna_generation
+dna_kmer: Table = DBService.dna_kmer
+dna_sequence_chunk: Table = DBService.dna_sequence_chunk
+dna_sequence_owner: Alias = DBService.dna_sequence_owner
+dna_sequence_staging: Table = DBService.dna_sequence_staging
 user: Table = DBService.user
 
+# bases of a sequence, whether stored as text or packed
+dna_sequence_bases: ColumnElement[str] = DBService.dna_sequence_bases
+dna_sequence_unpacked: Lateral = DBService.dna_sequence_unpacked
+
+T = TypeVar("T")
+
+# length of the factors looked up in the trigram indexes
+TRIGRAM_LENGTH = 3
+
+# bytes (of bases, or serialized results) from which parsing or scanning them
+# is offloaded (see `DBService.offload`); smaller inputs are not worth the
+# round trip to a worker thread
+OFFLOAD_SIZE = 2**16
+
 
 class DNASequenceCollection(Collection[DNASequence]):
     """
     `DNASequence` collection that acts as the DNA controller of the API.
     """
+
     def __init__(self, db: DBService = DBService()) -> None:
         self._db = db
         self._users = UserCollection(db)
+        self._cache = CacheService() if db.config.cache_size else None
 
     def __enter__(self):
+        # statements of the block share a single connection and transaction
+        self._unit_of_work = self._db.unit_of_work()
+        self._unit_of_work.__enter__()
         return self
 
-    def __exit__(self, *_):
-        ...
+    def __exit__(self, *exc_info):
+        return self._unit_of_work.__exit__(*exc_info)
+
+    def _offload(self, size: int, function: Callable[..., T], *args) -> T:
+        """
+        Runs CPU-bound `function` through `DBService.offload` when its input
+        is at least `OFFLOAD_SIZE` bytes, else right away.
+        """
+        if size < OFFLOAD_SIZE:
+            return function(*args)
+
+        return self._db.offload(function, *args)
+
+    def _parsed(self, record: Row) -> DNASequence:
+        return self._offload(_stored_size(record), _as_sequence, record)
 
     def __contains__(self, dna: DNASequence) -> bool:
         return bool(
@@ -35,147 +136,1614 @@ class DNASequenceCollection(Collection[DNASequence]):
             ).scalar()
         )
 
-    def __getitem__(self, id: int) -> DNASequence:
-        return DNASequence.from_orm(
+    def exists(self, id: int) -> bool:
+        return bool(
             self._db.execute(
-                select(
-                    dna_sequence, func.row_to_json(user.table_valued()).label("creator")
+                select(func.count(dna_sequence.c.id)).where(dna_sequence.c.id == id)
+            ).scalar()
+        )
+
+    def __getitem__(self, id: int) -> DNASequence:
+        # stored sequences never change, i.e. are cached at a single generation
+        (sequence,) = self._cached(
+            f"dna:{id}",
+            lambda: "",
+            DNASequence,
+            lambda: [
+                self._parsed(
+                    self._db.execute(_project().where(dna_sequence.c.id == id)).one()
                 )
-                .join_from(dna_sequence, user)
-                .where(dna_sequence.c.id == id)
-            ).one()
+            ],
         )
 
+        return sequence
+
     def __iter__(self) -> Iterator[DNASequence]:
-        return iter(
-            map(
-                DNASequence.from_orm,
-                self._db.execute(
-                    select(
-                        dna_sequence,
-                        func.row_to_json(user.table_valued()).label("creator"),
-                    ).join_from(dna_sequence, user)
-                ),
-            )
-        )
+        return self.page()
 
     def __len__(self) -> int:
         return self._db.execute(select(func.count(dna_sequence.c.id))).scalar()
 
+    def page(
+        self,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Set[str]] = None,
+    ) -> Iterator[DNASequence]:
+        """
+        Streams sequences in ID order, starting after `after_id` (keyset
+        pagination), up to `limit` sequences; see `_project` for `fields`.
+        """
+        cursor = self._db.stream(_paginate(_project(fields), after_id, limit))
+
+        for record in cursor:
+            yield self._offload(_stored_size(record), _as_sequence, record, fields)
+
     def add(self, dna: DNASequence) -> Optional[DNASequence]:
+        stored = self._offload(
+            len(dna.bases), _stored_bases, dna.bases, self._db.config.packed_bases
+        )
+
+        if self._db.config.dedup_bases:
+            # identical bases already stored are referenced rather than stored
+            owner_id = self._db.execute(_owner_of(stored["bases_sha256"])).scalar()
+
+            if owner_id is not None:
+                stored.update(bases=None, bases_packed=None, bases_id=owner_id)
+
         # insertion statement (as CTE)
         cte = (
             insert(dna_sequence)
             .on_conflict_do_nothing(index_elements=[dna_sequence.c.benchling_id])
             .values(
                 benchling_id=dna.benchling_id,
-                creator_id=self._users.get(
-                    dna.creator.id or dna.creator.benchling_id, dna.creator
-                ).id,
+                creator_id=self._users.resolve([dna.creator])[dna.creator.benchling_id],
                 name=dna.name,
                 created_at=dna.created_at,
-                bases=dna.bases,
+                **stored,
             )
             .returning(dna_sequence)
             .cte()
         )
 
-        # join newly inserted sequences with user
-        statement = select(
-            cte, func.row_to_json(user.table_valued()).label("creator")
-        ).join_from(cte, user)
+        with self._db.transaction():
+            record = self._db.execute(_inserted(cte)).one_or_none()
 
-        record = self._db.execute(statement).one_or_none()
-
-        if record:
-            return DNASequence.from_orm(record)
+            if record:
+                sequence = self._parsed(record)
+                self.index([sequence])
+                self.chunk([record.id])
+                self._bump()
+                return sequence
 
     def update(self, dna: List[DNASequence]):
-        # add users
-        self._users.update(map(attrgetter("creator"), dna))
+        with self._db.transaction() as connection:
+            dna_batch = self._ingest(connection, dna)
+            self._indexed(dna_batch)
+
+        return dna_batch
+
+    def add_to_batch(
+        self, batch_id: int, dna: List[DNASequence], through: int, processed: int
+    ) -> List[DNASequence]:
+        """
+        Ingests `dna`, the valid sequences of a chunk of `processed` items of
+        batch `batch_id`, committing them together with the batch progress.
+        """
+        with self._db.transaction() as connection:
+            dna_batch = self._ingest(connection, dna)
+            self._db.update_batch(
+                connection,
+                batch_id,
+                list(map(attrgetter("id"), dna_batch)),
+                through=through,
+                processed=processed,
+                failed=processed - len(dna),
+            )
+            self._indexed(dna_batch)
+
+        return dna_batch
+
+    def _indexed(self, dna_batch: List[DNASequence]):
+        """
+        Indexes and chunks the sequences of `dna_batch`, just added, then bumps
+        the generation of stored sequences, within the transaction adding them.
+        """
+        if dna_batch:
+            self.index(dna_batch)
+            self.chunk(list(map(attrgetter("id"), dna_batch)))
+            self._bump()
+
+    def _ingest(
+        self, connection: Connection, dna: List[DNASequence]
+    ) -> List[DNASequence]:
+        # add and resolve users, all at once
+        creator_ids = self._users.resolve(map(attrgetter("creator"), dna))
+
+        # format dna sequence records (packing and hashing their bases)
+        rows = self._db.offload(
+            _as_tuples, dna, self._db.config.packed_bases, creator_ids
+        )
+
+        if self._db.config.copy_ingest:
+            return self._copy(connection, rows)
+
+        return self._insert(connection, rows)
 
-        # format dna sequence records
+    def _insert(self, connection: Connection, rows: List[tuple]) -> List[DNASequence]:
+        """
+        Inserts `rows` in a single statement from a `VALUES` list.
+        """
         new_dna = values(
             column("benchling_id"),
-            column("creator_benchling_id"),
+            column("creator_id", Integer),
             column("name"),
             column("created_at", DateTime),
             column("bases"),
+            column("bases_packed", LargeBinary),
+            column("bases_sha256", LargeBinary),
             name="new_dna",
-        ).data(list(map(_as_tuple, as_records(dna, exclude={"id"}))))
+        ).data(list(rows))
 
-        # construct bulk insert statement (as CTE)
-        cte = (
-            insert(dna_sequence)
-            .on_conflict_do_nothing(index_elements=[dna_sequence.c.benchling_id])
+        records = connection.execute(_merge(new_dna, self._db.config.dedup_bases)).all()
+
+        return self._db.offload(_as_sequences, records)
+
+    def _copy(self, connection: Connection, rows: List[tuple]) -> List[DNASequence]:
+        """
+        Streams `rows` into a staging table through `COPY`, then merges them
+        `merge_size` rows per statement, within the transaction of
+        `connection`.
+        """
+        staging = dna_sequence_staging
+        size = self._db.config.merge_size
+        dna_batch = []
+
+        staging.create(connection)
+        count = self._db.copy(
+            connection, staging, ((n, *row) for n, row in enumerate(rows))
+        )
+
+        for n in range(0, count, size):
+            records = connection.execute(
+                _merge(
+                    staging,
+                    self._db.config.dedup_bases,
+                    staging.c.n >= n,
+                    staging.c.n < n + size,
+                )
+            ).all()
+            dna_batch.extend(self._db.offload(_as_sequences, records))
+
+        # dropped now rather than on commit, as a unit of work may ingest again
+        staging.drop(connection)
+
+        return dna_batch
+
+    def index(self, dna_batch: List[DNASequence]):
+        """
+        Indexes the k-mers of `dna_batch`, just added, when `kmer_index` is
+        set; sequences storing their bases by reference share their owner's.
+        """
+        config = self._db.config
+
+        if not config.kmer_index or not dna_batch:
+            return
+
+        owners = dna_batch
+
+        if config.dedup_bases:
+            owned = set(
+                self._db.execute(
+                    select(dna_sequence.c.id).where(
+                        dna_sequence.c.id.in_(map(attrgetter("id"), dna_batch)),
+                        dna_sequence.c.bases_id.is_(None),
+                    )
+                ).scalars()
+            )
+            owners = [d for d in dna_batch if d.id in owned]
+
+        self._index([(d.id, d.bases) for d in owners])
+
+    def reindex(self, limit: Optional[int] = None) -> int:
+        """
+        Indexes the k-mers of up to `limit` sequences not indexed yet, or
+        indexed with another `kmer_size`, skipping those being indexed
+        concurrently; returns their number (0 once all are indexed).
+        """
+        config = self._db.config
+
+        if not config.kmer_index:
+            return 0
+
+        pending = self._db.execute(
+            select(dna_sequence.c.id, dna_sequence_bases)
+            .where(
+                dna_sequence.c.bases_id.is_(None),
+                ~exists().where(
+                    dna_kmer.c.dna_sequence_id == dna_sequence.c.id,
+                    dna_kmer.c.k == config.kmer_size,
+                ),
+            )
+            .order_by(dna_sequence.c.id)
+            .limit(limit)
+            .with_for_update(of=dna_sequence, skip_locked=True)
+        ).all()
+
+        if pending:
+            self._index(pending)
+            # k-mer search results change once sequences are indexed
+            self._bump()
+
+        return len(pending)
+
+    def _index(self, sequences: List[Tuple[int, str]]):
+        """
+        Replaces the k-mers of `sequences` (ID and bases) in the index,
+        extracted client-side and streamed through `COPY`.
+        """
+        k = self._db.config.kmer_size
+        ids = [id for id, _ in sequences]
+
+        with self._db.transaction() as connection:
+            connection.execute(
+                delete(dna_kmer).where(dna_kmer.c.dna_sequence_id.in_(ids))
+            )
+            self._db.copy(
+                connection, dna_kmer, self._db.offload(_kmer_rows, sequences, k)
+            )
+
+    def chunk(self, ids: List[int]):
+        """
+        Splits the bases of sequences `ids` into `chunk_size` chunks
+        server-side, unless `chunk_size` is 0. Sequences storing their bases
+        by reference share their owner's chunks.
+        """
+        size = self._db.config.chunk_size
+
+        if not size:
+            return
+
+        chunks = (
+            func.generate_series(
+                0, (func.length(dna_sequence_unpacked.c.bases) - 1) // size
+            )
+            .table_valued("chunk")
+            .render_derived(name="chunks")
+            .lateral()
+        )
+
+        self._db.execute(
+            insert(dna_sequence_chunk)
+            .on_conflict_do_nothing()
             .from_select(
                 [
-                    dna_sequence.c.benchling_id,
-                    dna_sequence.c.creator_id,
-                    dna_sequence.c.name,
-                    dna_sequence.c.created_at,
-                    dna_sequence.c.bases,
+                    dna_sequence_chunk.c.dna_sequence_id,
+                    dna_sequence_chunk.c.chunk,
+                    dna_sequence_chunk.c.bases,
                 ],
                 select(
-                    new_dna.c.benchling_id,
-                    user.c.id,
-                    new_dna.c.name,
-                    new_dna.c.created_at,
-                    new_dna.c.bases,
-                ).join_from(
-                    new_dna,
-                    user,
-                    new_dna.c.creator_benchling_id == user.c.benchling_id,
+                    dna_sequence.c.id,
+                    chunks.c.chunk,
+                    func.substr(
+                        dna_sequence_unpacked.c.bases, chunks.c.chunk * size + 1, size
+                    ),
+                )
+                .join_from(dna_sequence, dna_sequence_unpacked, true())
+                .join(chunks, true())
+                .where(dna_sequence.c.id.in_(ids), dna_sequence.c.bases_id.is_(None)),
+            )
+        )
+
+    def rechunk(self, limit: Optional[int] = None) -> int:
+        """
+        Chunks the bases of up to `limit` sequences not chunked yet, skipping
+        those being chunked concurrently; returns their number (0 once all
+        are chunked).
+        """
+        if not self._db.config.chunk_size:
+            return 0
+
+        pending = (
+            self._db.execute(
+                select(dna_sequence.c.id)
+                .where(
+                    dna_sequence.c.bases_id.is_(None),
+                    ~exists().where(
+                        dna_sequence_chunk.c.dna_sequence_id == dna_sequence.c.id
+                    ),
+                )
+                .order_by(dna_sequence.c.id)
+                .limit(limit)
+                .with_for_update(of=dna_sequence, skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+
+        if pending:
+            self.chunk(pending)
+
+        return len(pending)
+
+    def bases(
+        self, id: int, start: int = 0, end: Optional[int] = None
+    ) -> Iterator[str]:
+        """
+        Streams bases `start` to `end` (0-based, end-exclusive) of sequence
+        `id`, reading only the chunks covering that range; without chunks
+        (`chunk_size` of 0), the range is sliced server-side.
+        """
+        size = self._db.config.chunk_size
+
+        if not size:
+            length = [] if end is None else [max(end - start, 0)]
+            statement = select(
+                func.substr(dna_sequence_bases, start + 1, *length).label("bases")
+            ).where(dna_sequence.c.id == id)
+
+            for record in self._db.stream(statement):
+                yield record.bases
+
+            return
+
+        owner_id = func.coalesce(
+            select(dna_sequence.c.bases_id)
+            .where(dna_sequence.c.id == id)
+            .scalar_subquery(),
+            id,
+        )
+        statement = (
+            select(dna_sequence_chunk.c.chunk, dna_sequence_chunk.c.bases)
+            .where(
+                dna_sequence_chunk.c.dna_sequence_id == owner_id,
+                dna_sequence_chunk.c.chunk >= start // size,
+            )
+            .order_by(dna_sequence_chunk.c.chunk)
+        )
+
+        if end is not None:
+            statement = statement.where(dna_sequence_chunk.c.chunk <= (end - 1) // size)
+
+        for record in self._db.stream(statement):
+            offset = record.chunk * size
+            yield record.bases[
+                max(start - offset, 0) : None if end is None else max(end - offset, 0)
+            ]
+
+    def digest(self, limit: Optional[int] = None) -> int:
+        """
+        Hashes the bases of up to `limit` sequences stored before content
+        hashes existed, server-side, skipping those being hashed concurrently;
+        returns their number (0 once all are hashed).
+        """
+        pending = (
+            select(dna_sequence.c.id)
+            .where(dna_sequence.c.bases_sha256.is_(None))
+            .order_by(dna_sequence.c.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+
+        return self._db.execute(
+            update(dna_sequence)
+            .where(dna_sequence.c.id.in_(pending))
+            .values(
+                bases_sha256=func.sha256(
+                    func.convert_to(func.lower(dna_sequence_bases), "UTF8")
+                )
+            )
+        ).rowcount
+
+    def by_digest(
+        self,
+        digest: bytes,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Set[str]] = None,
+    ) -> Iterator[DNASequence]:
+        """
+        Streams the sequences whose bases hash to `digest` (see `_digest`).
+        """
+        cursor = self._db.stream(
+            _paginate(
+                _project(fields).where(dna_sequence.c.bases_sha256 == digest),
+                after_id,
+                limit,
+            )
+        )
+
+        for record in cursor:
+            yield self._offload(_stored_size(record), _as_sequence, record, fields)
+
+    def search(
+        self,
+        pattern: str,
+        engine: SearchEngine = SearchEngine.TRIGRAM,
+        strand: Strand = Strand.FORWARD,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        max_mismatches: Optional[int] = None,
+        max_edits: Optional[int] = None,
+    ) -> Iterator[DNASequenceSearchResult]:
+        """
+        Searches sequences matching `pattern` on `strand`, exactly or, given
+        `max_mismatches` or `max_edits`, approximately (see `_approximate`);
+        results are cached until sequences are added.
+        """
+        arguments = (
+            pattern,
+            engine,
+            strand,
+            after_id,
+            limit,
+            max_mismatches,
+            max_edits,
+        )
+
+        return self._cached(
+            "search:" + json.dumps(arguments),
+            self._generation,
+            DNASequenceSearchResult,
+            lambda: self._search(*arguments),
+        )
+
+    def _search(
+        self,
+        pattern: str,
+        engine: SearchEngine,
+        strand: Strand,
+        after_id: Optional[int],
+        limit: Optional[int],
+        max_mismatches: Optional[int],
+        max_edits: Optional[int],
+    ) -> Iterator[DNASequenceSearchResult]:
+        if max_mismatches is not None or max_edits is not None:
+            hits = self._approximate(
+                _project(),
+                pattern,
+                engine,
+                strand,
+                max_mismatches,
+                max_edits,
+                after_id=after_id,
+            )
+
+            for record, matches in islice(hits, limit):
+                result = self._offload(_stored_size(record), _as_search_result, record)
+                # first match per strand
+                first = {}
+
+                for match in matches:
+                    first.setdefault(match.strand, match.dict(exclude={"context"}))
+
+                result.matches = [
+                    DNASequenceMatch.parse_obj(first[s])
+                    for s in (Strand.FORWARD, Strand.REVERSE)
+                    if s in first
+                ]
+
+                yield result
+
+            return
+
+        regexes = _strand_regexes(pattern, strand)
+
+        # offset (1-based) of the first match per strand; 0 if none
+        offsets = [
+            func.regexp_instr(dna_sequence_unpacked.c.bases, r, 1, 1, 0, "i").label(
+                s.value
+            )
+            for s, r in regexes.items()
+        ]
+
+        patterns = _strand_patterns(pattern, strand).values()
+        cursor = self._fan_out(
+            lambda partition: _paginate(
+                _project()
+                .add_columns(*offsets)
+                .join(dna_sequence_unpacked, true())
+                .where(*self._matching(patterns, engine, partition)),
+                after_id,
+                limit,
+            )
+        )
+
+        for record in islice(cursor, limit):
+            result = self._offload(_stored_size(record), _as_search_result, record)
+            result.matches = [
+                DNASequenceMatch(strand=s, offset=getattr(record, s.value) - 1)
+                for s in regexes
+                if getattr(record, s.value)
+            ]
+
+            yield result
+
+    def hits(
+        self,
+        pattern: str,
+        engine: SearchEngine = SearchEngine.TRIGRAM,
+        strand: Strand = Strand.FORWARD,
+        flank: Optional[int] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        max_mismatches: Optional[int] = None,
+        max_edits: Optional[int] = None,
+    ) -> Iterator[DNASequenceHit]:
+        """
+        Searches like `search`, but only yields every match offset (with
+        `flank` bases of context on either side, if given) per hit; offsets
+        and context are computed server-side, so `bases` never leaves the
+        database (only the windows around seeds of approximate matches do).
+        """
+        if max_mismatches is not None or max_edits is not None:
+            hits = self._approximate(
+                select(dna_sequence.c.id, dna_sequence.c.benchling_id),
+                pattern,
+                engine,
+                strand,
+                max_mismatches,
+                max_edits,
+                flank,
+                after_id,
+            )
+
+            for record, matches in islice(hits, limit):
+                yield DNASequenceHit(
+                    id=record.id, benchling_id=record.benchling_id, matches=matches
+                )
+
+            return
+
+        matches = union_all(
+            *(
+                select(
+                    literal(s.value).label("strand"),
+                    func.dna_match_offsets(dna_sequence_unpacked.c.bases, r).label(
+                        "offset"
+                    ),
+                ).correlate(dna_sequence_unpacked)
+                for s, r in _strand_regexes(pattern, strand).items()
+            )
+        ).lateral("matches")
+
+        context = None
+
+        if flank is not None:
+            start = func.greatest(matches.c.offset + 1 - flank, 1)
+            context = func.substr(
+                dna_sequence_unpacked.c.bases,
+                start,
+                matches.c.offset + 1 + len(pattern) + flank - start,
+            )
+
+        patterns = _strand_patterns(pattern, strand).values()
+        cursor = self._fan_out(
+            lambda partition: _paginate(
+                select(
+                    dna_sequence.c.id,
+                    dna_sequence.c.benchling_id,
+                    func.json_agg(
+                        aggregate_order_by(
+                            func.json_build_object(
+                                "strand",
+                                matches.c.strand,
+                                "offset",
+                                matches.c.offset,
+                                "context",
+                                context,
+                            ),
+                            matches.c.offset,
+                        )
+                    ).label("matches"),
+                )
+                .join_from(dna_sequence, dna_sequence_unpacked, true())
+                .join(matches, true())
+                .where(*self._matching(patterns, engine, partition))
+                # the primary key includes `benchling_id` once partitioned
+                .group_by(dna_sequence.c.id, dna_sequence.c.benchling_id),
+                after_id,
+                limit,
+            )
+        )
+
+        for record in islice(cursor, limit):
+            yield DNASequenceHit.from_orm(record)
+
+    def _cached(
+        self,
+        key: str,
+        generation: Callable[[], str],
+        model: Type[BaseModel],
+        results: Callable[[], Iterable[BaseModel]],
+    ) -> Iterator[BaseModel]:
+        """
+        Streams the `model` results cached at `key` for the current
+        `generation`; else streams `results`, caching them once exhausted
+        unless they exceed the cache capacity.
+        """
+        if self._cache is None:
+            yield from results()
+            return
+
+        current = generation()
+        cached = self._cache.get(key, current, self._db)
+
+        if cached is not None:
+            yield from self._offload(len(cached), _parsed_lines, model, cached)
+            return
+
+        lines, size = [], 0
+
+        for result in results():
+            yield result
+
+            if lines is not None:
+                lines.append(
+                    self._offload(
+                        len(getattr(result, "bases", None) or ""), _serialized, result
+                    )
+                )
+                size += len(lines[-1]) + 1
+
+                if size > self._cache.capacity:
+                    lines = None
+
+        if lines is not None:
+            self._cache.put(key, current, b"\n".join(lines), self._db)
+
+    def _generation(self) -> str:
+        """
+        Returns the generation of stored sequences; as they are only ever
+        inserted, it changes exactly when sequences are added (see `_bump`).
+        """
+        return str(
+            self._db.execute(
+                select(func.coalesce(func.max(dna_generation.c.generation), 0))
+            ).scalar()
+        )
+
+    def _bump(self):
+        """
+        Bumps the generation of stored sequences within the transaction
+        adding (and indexing) them, so it is committed (i.e. seen) together
+        with them; last, as it locks the generation until then.
+        """
+        statement = insert(dna_generation).values(id=1, generation=1)
+        self._db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[dna_generation.c.id],
+                set_={"generation": dna_generation.c.generation + 1},
+            )
+        )
+
+    def regex_search(
+        self,
+        compiled: CompiledRegex,
+        engine: SearchEngine = SearchEngine.TRIGRAM,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[DNASequenceSearchResult]:
+        """
+        Searches sequences matching the (restricted) `compiled` regex, with
+        candidates shortlisted by the index of `engine` through its literal
+        factors; every statement is bounded by `regex_timeout` seconds, and
+        results by `regex_limit`.
+        """
+        config = self._db.config
+        candidates = None
+
+        if engine is SearchEngine.KMER:
+            candidates = _kmer_candidates(compiled.factors, config.kmer_size)
+
+        bases = dna_sequence_unpacked.c.bases
+        limit = min(limit or config.regex_limit, config.regex_limit)
+
+        cursor = self._db.stream(
+            _paginate(
+                _project()
+                .add_columns(
+                    func.regexp_instr(bases, compiled.regex, 1, 1, 0, "i").label(
+                        "offset"
+                    ),
+                    func.length(
+                        func.regexp_substr(bases, compiled.regex, 1, 1, "i")
+                    ).label("length"),
+                )
+                .join(dna_sequence_unpacked, true())
+                .where(
+                    *_shortlisted(
+                        compiled.regex,
+                        candidates,
+                        simplify(compiled.factors, TRIGRAM_LENGTH),
+                    )
                 ),
+                after_id,
+                limit,
+            ),
+            timeout=config.regex_timeout,
+        )
+
+        for record in cursor:
+            result = self._offload(_stored_size(record), _as_search_result, record)
+            result.matches = [
+                DNASequenceMatch(
+                    strand=Strand.FORWARD,
+                    offset=record.offset - 1,
+                    length=record.length,
+                )
+            ]
+
+            yield result
+
+    def multi_search(
+        self,
+        patterns: List[str],
+        engine: SearchEngine = SearchEngine.TRIGRAM,
+        strand: Strand = Strand.FORWARD,
+        counts_only: bool = False,
+        limit: Optional[int] = None,
+    ) -> Iterator[DNASequencePatternHits]:
+        """
+        Searches sequences matching any of `patterns` (e.g. a primer panel)
+        on `strand`, scanning each candidate once with a multi-pattern
+        automaton (see `multi.Automaton`); yields the sequence and match
+        counts of each pattern, with up to `limit` hits unless `counts_only`.
+        Like `regex_search`, every statement is bounded by `regex_timeout`
+        seconds, and candidates (i.e. hits per pattern) by `regex_limit`.
+        Results are cached until sequences are added.
+        """
+        arguments = (patterns, engine, strand, counts_only, limit)
+
+        return self._cached(
+            "multi:" + json.dumps(arguments),
+            self._generation,
+            DNASequencePatternHits,
+            lambda: self._multi_search(*arguments),
+        )
+
+    def _multi_search(
+        self,
+        patterns: List[str],
+        engine: SearchEngine,
+        strand: Strand,
+        counts_only: bool,
+        limit: Optional[int],
+    ) -> Iterator[DNASequencePatternHits]:
+        keyed = {
+            (i, s): p
+            for i, pattern in enumerate(patterns)
+            for s, p in _strand_patterns(pattern, strand).items()
+        }
+        automaton = self._db.offload(multi.Automaton, keyed)
+
+        # candidates contain a literal factor of any pattern (on any strand)
+        factors = search_regex.compile(
+            "|".join(map(iupac.to_regex, keyed.values()))
+        ).factors
+        config = self._db.config
+        candidates = None
+
+        if engine is SearchEngine.KMER:
+            candidates = _kmer_candidates(factors, config.kmer_size)
+
+        cursor = self._db.stream(
+            select(
+                dna_sequence.c.id,
+                dna_sequence.c.benchling_id,
+                dna_sequence_unpacked.c.bases,
             )
-            .returning(dna_sequence)
-            .cte()
+            .join(dna_sequence_unpacked, true())
+            .where(*_prefiltered(candidates, simplify(factors, TRIGRAM_LENGTH)))
+            .order_by(dna_sequence.c.id)
+            .limit(config.regex_limit),
+            timeout=config.regex_timeout,
         )
+        # fields are set explicitly, i.e. serialized (see `routers.utils.stream`)
+        results = [
+            DNASequencePatternHits(
+                pattern=p,
+                sequence_count=0,
+                match_count=0,
+                **({} if counts_only else {"hits": []}),
+            )
+            for p in patterns
+        ]
 
-        # join newly inserted sequences with user
-        statement = select(
-            cte, func.row_to_json(user.table_valued()).label("creator")
-        ).join_from(cte, user)
+        for record in cursor:
+            matches = self._offload(
+                len(record.bases), _scanned, automaton, record.bases
+            )
 
-        return list(map(DNASequence.from_orm, self._db.execute(statement)))
+            for i, found in matches.items():
+                result = results[i]
+                result.sequence_count += 1
+                result.match_count += len(found)
 
-    def search(self, pattern: str) -> Iterator[DNASequence]:
-        cursor = self._db.execute(
-            select(dna_sequence, func.row_to_json(user.table_valued()).label("creator"))
-            .join_from(dna_sequence, user)
-            .where(dna_sequence.c.bases.ilike(f"%{pattern}%"))
+                if not counts_only and (limit is None or len(result.hits) < limit):
+                    result.hits.append(
+                        DNASequenceHit(
+                            id=record.id,
+                            benchling_id=record.benchling_id,
+                            matches=[
+                                DNASequenceHitMatch(strand=s, offset=offset)
+                                for s, offset in found
+                            ],
+                        )
+                    )
+
+        yield from results
+
+    def _approximate(
+        self,
+        statement: Select,
+        pattern: str,
+        engine: SearchEngine,
+        strand: Strand,
+        max_mismatches: Optional[int],
+        max_edits: Optional[int],
+        flank: Optional[int] = None,
+        after_id: Optional[int] = None,
+    ) -> Iterator[Tuple[Row, List[DNASequenceHitMatch]]]:
+        """
+        Streams the rows of `statement` (over sequences) matching `pattern` on
+        `strand` with at most `max_mismatches` mismatches or `max_edits` edits,
+        with their matches, by seed-and-verify: sequences containing any seed
+        of `pattern` (see `approximate.seeds`) are shortlisted by the index of
+        `engine`, then only the windows of bases around seed occurrences are
+        fetched and verified client-side.
+        """
+        errors = max_edits if max_mismatches is None else max_mismatches
+        patterns = _strand_patterns(pattern, strand)
+        min_length = min_seed_length(engine, self._db.config)
+        seeds = {
+            s: approximate.seeds(p.lower(), errors, min_length)
+            for s, p in patterns.items()
+        }
+
+        # offsets of the alignments of the pattern with every seed occurrence
+        aligned = union_all(
+            *(
+                select(
+                    literal(s.value).label("strand"),
+                    (
+                        func.dna_match_offsets(
+                            dna_sequence_unpacked.c.bases, iupac.to_regex(piece)
+                        )
+                        - offset
+                    ).label("offset"),
+                ).correlate(dna_sequence_unpacked)
+                for s, pieces in seeds.items()
+                for offset, piece in pieces
+            )
+        ).subquery("aligned")
+
+        # windows covering every match (and its context) of each alignment,
+        # overlapping windows merged
+        padding = (max_edits or 0) + (flank or 0)
+        spans = (
+            select(
+                aligned.c.strand,
+                func.unnest(
+                    func.range_agg(
+                        func.int4range(
+                            func.greatest(aligned.c.offset - padding, 0),
+                            aligned.c.offset + len(pattern) + padding,
+                        )
+                    )
+                ).label("span"),
+            )
+            .group_by(aligned.c.strand)
+            .subquery("spans")
+        )
+        windows = (
+            select(
+                func.json_agg(
+                    func.json_build_object(
+                        "strand",
+                        spans.c.strand,
+                        "offset",
+                        func.lower(spans.c.span),
+                        "bases",
+                        func.substr(
+                            dna_sequence_unpacked.c.bases,
+                            func.lower(spans.c.span) + 1,
+                            func.upper(spans.c.span) - func.lower(spans.c.span),
+                        ),
+                    )
+                )
+            )
+            .correlate(dna_sequence_unpacked)
+            .scalar_subquery()
+            .label("windows")
+        )
+
+        pieces = [piece for p in seeds.values() for _, piece in p]
+        cursor = self._fan_out(
+            lambda partition: _paginate(
+                statement.add_columns(windows)
+                .join(dna_sequence_unpacked, true())
+                .where(*self._matching(pieces, engine, partition)),
+                after_id,
+                # candidates are only counted once verified
+                None,
+            )
         )
 
         for record in cursor:
-            yield DNASequence.from_orm(record)
+            windows = record.windows or []
+            matches = self._offload(
+                sum(len(w["bases"]) for w in windows),
+                _verified_windows,
+                windows,
+                patterns,
+                max_mismatches,
+                max_edits,
+                flank,
+            )
 
-    def by_batch(self, batch_id: int) -> Iterator[DNASequence]:
-        cursor = self._db.execute(
-            select(dna_sequence, func.row_to_json(user.table_valued()).label("creator"))
-            .join_from(dna_sequence, user)
-            .join_from(dna_sequence, dna_batch)
-            .where(dna_batch.c.batch_id == batch_id)
+            if matches:
+                yield record, matches
+
+    def _fan_out(self, statement: Callable[[Optional[int]], Select]) -> Iterator[Row]:
+        """
+        Streams `statement(partition)` over every partition (see
+        `DBService.partition`) concurrently, merged in ID order (see
+        `DBService.fan_out`); streams `statement(None)` when unpartitioned.
+        """
+        partitions = self._db.config.partitions
+
+        if not partitions:
+            return self._db.stream(statement(None))
+
+        return self._db.fan_out(
+            list(map(statement, range(partitions))), attrgetter("id")
+        )
+
+    def _matching(
+        self,
+        patterns: Collection[str],
+        engine: SearchEngine,
+        partition: Optional[int] = None,
+    ) -> List[ColumnElement[bool]]:
+        """
+        Builds the criteria of sequences matching any of `patterns`, with
+        candidates shortlisted by the index of `engine`; by its `partition`
+        alone when given, i.e. among the sequences whose bases (or k-mers)
+        are stored in that partition, and those referencing them.
+        """
+        # patterns (e.g. both strands) are matched by a single alternation,
+        # i.e. a single scan
+        regex = "|".join(sorted(set(map(iupac.to_regex, patterns))))
+
+        if engine is SearchEngine.KMER:
+            postings = dna_kmer
+
+            if partition is not None:
+                postings = DBService.partition(dna_kmer, partition)
+
+            # only unambiguous segments of the pattern are k-mer indexed
+            candidates = [
+                kmer.candidates(p, self._db.config.kmer_size, postings)
+                for p in patterns
+            ]
+
+            if None not in candidates:
+                return _shortlisted(regex, union(*candidates))
+
+        stored = None
+
+        if partition is not None:
+            stored = DBService.partition(dna_sequence, partition)
+
+        return _shortlisted(regex, stored=stored)
+
+    def by_batch(
+        self,
+        batch_id: int,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[DNASequence]:
+        cursor = self._db.stream(
+            _paginate(
+                _project()
+                .join(dna_batch, dna_batch.c.dna_sequence_id == dna_sequence.c.id)
+                .where(dna_batch.c.batch_id == batch_id),
+                after_id,
+                limit,
+            )
         )
 
         for record in cursor:
-            yield DNASequence.from_orm(record)
+            yield self._offload(_stored_size(record), _as_sequence, record)
 
-    def by_user(self, user_id: int) -> Iterator[DNASequence]:
-        cursor = self._db.execute(
-            select(dna_sequence, func.row_to_json(user.table_valued()).label("creator"))
-            .join_from(dna_sequence, user)
-            .where(user.c.id == user_id)
+    def by_user(
+        self,
+        user_id: int,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[Set[str]] = None,
+    ) -> Iterator[DNASequence]:
+        cursor = self._db.stream(
+            _paginate(
+                _project(fields).where(dna_sequence.c.creator_id == user_id),
+                after_id,
+                limit,
+            )
         )
 
         for record in cursor:
-            yield DNASequence.from_orm(record)
+            yield self._offload(_stored_size(record), _as_sequence, record, fields)
+
+
+def min_seed_length(engine: SearchEngine, config: Config) -> int:
+    """
+    Returns the length of the shortest seed of approximate search (see
+    `approximate.seeds`) the index of `engine` shortlists candidates by;
+    shorter seeds would fall back to another index, or to a scan.
+    """
+    if engine is SearchEngine.KMER:
+        return config.kmer_size
+
+    return TRIGRAM_LENGTH
+
 
+def unfiltered(patterns: List[str], engine: SearchEngine, config: Config) -> List[str]:
+    """
+    Returns those of `patterns` without a literal factor the index of
+    `engine` can look up (see `min_seed_length`); a panel holding any could
+    not shortlist candidates, and would be scanned for in every sequence.
+    """
+    min_length = min_seed_length(engine, config)
+
+    return [
+        p
+        for p in patterns
+        if simplify(search_regex.compile(iupac.to_regex(p)).factors, min_length) is None
+    ]
+
+
+def _as_tuples(
+    dna: List[DNASequence], packed: bool, creator_ids: Dict[str, int]
+) -> List[tuple]:
+    return [_as_tuple(r, packed, creator_ids) for r in as_records(dna, exclude={"id"})]
+
+
+def _as_tuple(r: Dict, packed: bool, creator_ids: Dict[str, int]) -> tuple:
+    stored = _stored_bases(r["bases"], packed)
 
-def _as_tuple(r: Dict) -> tuple:
     return (
         r["benchling_id"],
-        r["creator"]["benchling_id"],
+        creator_ids[r["creator"]["benchling_id"]],
         r["name"],
         r["created_at"],
-        r["bases"],
+        stored["bases"],
+        stored["bases_packed"],
+        stored["bases_sha256"],
+    )
+
+
+def _merge(source: FromClause, dedup: bool, *where: ColumnElement[bool]) -> Select:
+    """
+    Inserts the new sequences of `source` (skipping existing ones) and selects
+    the inserted sequences joined with their creator; when `dedup`, bases
+    already stored, or repeated within `source`, are stored once and
+    referenced otherwise.
+    """
+    new_dna = [
+        source.c.benchling_id,
+        source.c.creator_id,
+        source.c.name,
+        source.c.created_at,
+    ]
+    bases = source.c.bases
+    # untyped when every row is stored as text
+    bases_packed = cast(source.c.bases_packed, LargeBinary)
+
+    if not dedup:
+        return _inserted(
+            _insertion(
+                select(
+                    *new_dna, bases, bases_packed, source.c.bases_sha256, null()
+                ).where(*where)
+            )
+        )
+
+    stored = _owner_of(source.c.bases_sha256).correlate(source).lateral("stored")
+
+    # a single new sequence of each bases not stored yet stores them (the
+    # statement does not see its own insertions) ...
+    owners = _insertion(
+        select(*new_dna, bases, bases_packed, source.c.bases_sha256, null())
+        .select_from(source)
+        .outerjoin(stored, true())
+        .where(
+            *where,
+            stored.c.id.is_(None),
+            ~exists().where(dna_sequence.c.benchling_id == source.c.benchling_id),
+        )
+        .distinct(source.c.bases_sha256),
+        name="owners",
+    )
+
+    # ... and every other one references either that or the stored sequence
+    bases_id = func.coalesce(stored.c.id, owners.c.id)
+    references = _insertion(
+        select(
+            *new_dna,
+            case((bases_id.is_(None), bases)),
+            case((bases_id.is_(None), bases_packed)),
+            source.c.bases_sha256,
+            bases_id,
+        )
+        .select_from(source)
+        .outerjoin(stored, true())
+        .outerjoin(owners, owners.c.bases_sha256 == source.c.bases_sha256)
+        .where(*where, source.c.benchling_id.not_in(select(owners.c.benchling_id))),
+        name="references",
+    )
+
+    # references to new owners take their bases from them, as stored owners
+    # are outer joined by `_inserted` but new ones are not visible to it
+    referenced = select(
+        *(
+            func.coalesce(c, owners.c[c.name]).label(c.name)
+            if c.name in ("bases", "bases_packed")
+            else c
+            for c in references.c
+        )
+    ).outerjoin_from(references, owners, owners.c.id == references.c.bases_id)
+
+    return _inserted(union_all(select(owners), referenced).subquery("inserted"))
+
+
+def _insertion(rows: Select, name: str = "inserted") -> CTE:
+    """
+    Inserts sequences `rows` (skipping existing ones) as a CTE returning them.
+    """
+    return (
+        insert(dna_sequence)
+        .on_conflict_do_nothing(index_elements=[dna_sequence.c.benchling_id])
+        .from_select(
+            [
+                dna_sequence.c.benchling_id,
+                dna_sequence.c.creator_id,
+                dna_sequence.c.name,
+                dna_sequence.c.created_at,
+                dna_sequence.c.bases,
+                dna_sequence.c.bases_packed,
+                dna_sequence.c.bases_sha256,
+                dna_sequence.c.bases_id,
+            ],
+            rows,
+        )
+        .returning(dna_sequence)
+        .cte(name)
+    )
+
+
+def _with_references(ids: Select) -> Select:
+    """
+    Selects sequences `ids` along with the sequences referencing their bases.
+    """
+    references = dna_sequence.alias("reference")
+    ids = ids.subquery()
+
+    return union(
+        select(ids),
+        select(references.c.id).where(references.c.bases_id.in_(select(ids))),
+    )
+
+
+def _inserted(inserted: FromClause) -> Select:
+    """
+    Selects the sequences `inserted` (by a CTE) joined with their creator (and
+    the owner of their bases).
+    """
+    return (
+        select(
+            *_resolved(inserted), func.row_to_json(user.table_valued()).label("creator")
+        )
+        .join_from(inserted, user, user.c.id == inserted.c.creator_id)
+        .outerjoin(dna_sequence_owner, dna_sequence_owner.c.id == inserted.c.bases_id)
+    )
+
+
+def _owner_of(digest: ColumnElement[bytes]) -> Select:
+    """
+    Selects the ID of the (first) sequence storing bases hashed to `digest`.
+    """
+    owner = dna_sequence.alias("stored_owner")
+    return (
+        select(owner.c.id)
+        .where(owner.c.bases_sha256 == digest, owner.c.bases_id.is_(None))
+        .order_by(owner.c.id)
+        .limit(1)
+    )
+
+
+def _resolved(source: FromClause) -> List[ColumnElement]:
+    """
+    Returns the columns of sequences `source`, with the bases of sequences
+    stored by reference taken from their (outer joined) owner.
+    """
+    return [
+        *(c for c in source.c if c.name not in ("bases", "bases_packed")),
+        func.coalesce(source.c.bases, dna_sequence_owner.c.bases).label("bases"),
+        func.coalesce(source.c.bases_packed, dna_sequence_owner.c.bases_packed).label(
+            "bases_packed"
+        ),
+    ]
+
+
+def _project(fields: Optional[Set[str]] = None) -> Select:
+    """
+    Selects only the columns of `DNASequence` `fields` (all when omitted), so
+    excluded columns, such as `bases`, are never fetched and the `user` join
+    is only made for `creator` (and the owner join only for `bases`).
+    """
+    resolved = {c.name: c for c in _resolved(dna_sequence)}
+    owned = dna_sequence_owner.c.id == dna_sequence.c.bases_id
+
+    if fields is None:
+        return (
+            select(
+                *resolved.values(),
+                func.row_to_json(user.table_valued()).label("creator"),
+            )
+            .join_from(dna_sequence, user)
+            .outerjoin(dna_sequence_owner, owned)
+        )
+
+    # ID is always selected as the keyset
+    columns = {dna_sequence.c.id}
+    columns.update(resolved[f] for f in fields if f in resolved)
+    statement = select().select_from(dna_sequence)
+
+    if "bases" in fields:
+        columns.add(resolved["bases_packed"])
+        statement = statement.outerjoin(dna_sequence_owner, owned)
+
+    if "creator" in fields:
+        columns.add(func.row_to_json(user.table_valued()).label("creator"))
+        statement = statement.join(user, user.c.id == dna_sequence.c.creator_id)
+
+    return statement.add_columns(*columns)
+
+
+def _as_sequence(record: Row, fields: Optional[Set[str]] = None) -> DNASequence:
+    with metrics.model_parse_duration.time(model="DNASequence"):
+        values = _decoded(record)
+
+        if fields is None:
+            return DNASequence.parse_obj(values)
+
+        # partial sequences bypass validation of the omitted (required) fields
+
+        if "creator" in values:
+            values["creator"] = User.parse_obj(values["creator"])
+
+        return DNASequence.construct(
+            _fields_set=fields, **{f: v for f, v in values.items() if f in fields}
+        )
+
+
+def _as_sequences(records: List[Row]) -> List[DNASequence]:
+    return list(map(_as_sequence, records))
+
+
+def _as_search_result(record: Row) -> DNASequenceSearchResult:
+    return DNASequenceSearchResult.parse_obj(_decoded(record))
+
+
+def _stored_size(record: Row) -> int:
+    """
+    Returns the size of the (text or packed) bases of `record`, if any.
+    """
+    values = record._mapping
+    return len(values.get("bases") or values.get("bases_packed") or "")
+
+
+def _parsed_lines(model: Type[BaseModel], lines: bytes) -> List[BaseModel]:
+    return list(map(model.parse_raw, lines.splitlines()))
+
+
+def _serialized(result: BaseModel) -> bytes:
+    return result.json(exclude_unset=True).encode()
+
+
+def _kmer_rows(sequences: List[Tuple[int, str]], k: int) -> List[tuple]:
+    """
+    Returns the rows of the k-mer index of `sequences` (ID and bases).
+    """
+    return [
+        row
+        for id, bases in sequences
+        for row in kmer.blocks(id, k, kmer.extract(bases, k))
+    ]
+
+
+def _scanned(
+    automaton: multi.Automaton, bases: str
+) -> Dict[int, List[Tuple[Strand, int]]]:
+    """
+    Returns the (strand and offset of) matches in `bases` of each pattern of
+    `automaton`, by pattern index.
+    """
+    matches: Dict[int, List[Tuple[Strand, int]]] = {}
+
+    for (i, s), offset in automaton.search(bases):
+        matches.setdefault(i, []).append((s, offset))
+
+    return matches
+
+
+def _decoded(record: Row) -> Dict:
+    """
+    Returns the values of `record`, with packed bases decoded into `bases`.
+    """
+    values = dict(record._mapping)
+    packed = values.pop("bases_packed", None)
+
+    if packed is not None:
+        values["bases"] = packing.unpack(packed)
+
+    return values
+
+
+def _stored_bases(bases: str, packed: bool) -> Dict:
+    """
+    Returns the column values storing `bases` as text, or packed (unless
+    packing would not make them smaller), along with their content hash.
+    """
+    digest = _digest(bases)
+
+    if packed:
+        packed_bases = packing.pack(bases)
+
+        if len(packed_bases) < len(bases):
+            return {"bases": None, "bases_packed": packed_bases, **digest}
+
+    return {"bases": bases, "bases_packed": None, **digest}
+
+
+def _digest(bases: str) -> Dict:
+    """
+    Returns the content hash, SHA-256 of the lowercase bases, of `bases`.
+    """
+    return {"bases_sha256": hashlib.sha256(bases.lower().encode("ascii")).digest()}
+
+
+def _paginate(statement: Select, after_id: Optional[int], limit: Optional[int]):
+    """
+    Applies keyset pagination on sequence ID to `statement`.
+    """
+    if after_id is not None:
+        statement = statement.where(dna_sequence.c.id > after_id)
+
+    return statement.order_by(dna_sequence.c.id).limit(limit)
+
+
+def _strand_patterns(pattern: str, strand: Strand) -> Dict[Strand, str]:
+    patterns = {}
+
+    if strand in (Strand.FORWARD, Strand.BOTH):
+        patterns[Strand.FORWARD] = pattern
+
+    if strand in (Strand.REVERSE, Strand.BOTH):
+        patterns[Strand.REVERSE] = iupac.reverse_complement(pattern)
+
+    return patterns
+
+
+def _verified_windows(
+    windows: List[Dict],
+    patterns: Dict[Strand, str],
+    max_mismatches: Optional[int],
+    max_edits: Optional[int],
+    flank: Optional[int],
+) -> List[DNASequenceHitMatch]:
+    """
+    Returns the matches in every (fetched) window, in offset order.
+    """
+    return sorted(
+        (
+            match
+            for window in windows
+            for match in _verified(window, patterns, max_mismatches, max_edits, flank)
+        ),
+        key=attrgetter("offset"),
     )
+
+
+def _verified(
+    window: Dict,
+    patterns: Dict[Strand, str],
+    max_mismatches: Optional[int],
+    max_edits: Optional[int],
+    flank: Optional[int],
+) -> Iterator[DNASequenceHitMatch]:
+    """
+    Yields the matches of the pattern of its strand in (fetched) `window`,
+    with `flank` bases of context when given.
+    """
+    strand = Strand(window["strand"])
+    pattern = patterns[strand].lower()
+    bases = window["bases"].lower()
+
+    if max_mismatches is not None:
+        matches = (
+            (offset, len(pattern), distance)
+            for offset, distance in approximate.mismatches(
+                pattern, bases, max_mismatches
+            )
+        )
+
+    else:
+        matches = approximate.edits(pattern, bases, max_edits)
+
+    for offset, length, distance in matches:
+        context = None
+
+        if flank is not None:
+            context = window["bases"][max(offset - flank, 0) : offset + length + flank]
+
+        yield DNASequenceHitMatch(
+            strand=strand,
+            offset=window["offset"] + offset,
+            length=length,
+            distance=distance,
+            context=context,
+        )
+
+
+def _shortlisted(
+    regex: str,
+    candidates: Optional[Select] = None,
+    factors: Factors = None,
+    stored: Optional[FromClause] = None,
+) -> List[ColumnElement[bool]]:
+    """
+    Builds the criteria of sequences matching `regex`: among the IDs of
+    `candidates` when given, else through the trigram indexes (of `stored`
+    sequences, e.g. a partition, when given), narrowed by the literal
+    `factors` of `regex` (see `regex.compile`).
+    """
+    if candidates is not None:
+        # k-mer posting lists shortlist candidates; `regexp_like` verifies
+        # them without going through the trigram index
+        return [
+            dna_sequence.c.id.in_(_with_references(candidates)),
+            func.regexp_like(dna_sequence_bases, regex, "i"),
+        ]
+
+    # trigram indexes on text and packed bases shortlist candidates for `~*`
+    # (and `ILIKE` on factors, which holds however complex the regex is)
+    if stored is None:
+        stored = dna_sequence.alias("stored")
+
+    matching = select(stored.c.id).where(
+        or_(
+            *(
+                and_(bases.regexp_match(regex, flags="i"), _contains(bases, factors))
+                for bases in (stored.c.bases, func.dna_unpack(stored.c.bases_packed))
+            )
+        )
+    )
+
+    return [dna_sequence.c.id.in_(_with_references(matching))]
+
+
+def _prefiltered(
+    candidates: Optional[Select] = None, factors: Factors = None
+) -> List[ColumnElement[bool]]:
+    """
+    Builds the criteria of sequences that may match, without verifying them:
+    among the IDs of `candidates` when given, else among those containing
+    the literal `factors` through the trigram indexes; none without either.
+    """
+    if candidates is not None:
+        return [dna_sequence.c.id.in_(_with_references(candidates))]
+
+    if factors is None:
+        return []
+
+    stored = dna_sequence.alias("stored")
+    containing = select(stored.c.id).where(
+        or_(
+            *(
+                _contains(bases, factors)
+                for bases in (stored.c.bases, func.dna_unpack(stored.c.bases_packed))
+            )
+        )
+    )
+
+    return [dna_sequence.c.id.in_(_with_references(containing))]
+
+
+def _contains(bases: ColumnElement[str], factors: Factors) -> ColumnElement[bool]:
+    """
+    Builds the criteria of `bases` containing `factors`.
+    """
+    if isinstance(factors, str):
+        return bases.ilike(f"%{factors}%")
+
+    if isinstance(factors, And):
+        return and_(*(_contains(bases, f) for f in factors))
+
+    if isinstance(factors, Or):
+        return or_(*(_contains(bases, f) for f in factors))
+
+    return true()
+
+
+def _kmer_candidates(factors: Factors, k: int) -> Optional[Select]:
+    """
+    Selects IDs of sequences whose posting lists contain the k-mers of
+    `factors`; `None` when `factors` have no indexable k-mer.
+    """
+    if isinstance(factors, str):
+        return kmer.candidates(factors, k)
+
+    if isinstance(factors, And):
+        candidates = [
+            c for c in (_kmer_candidates(f, k) for f in factors) if c is not None
+        ]
+        return intersect(*candidates) if candidates else None
+
+    if isinstance(factors, Or):
+        candidates = [_kmer_candidates(f, k) for f in factors]
+        return None if None in candidates else union(*candidates)
+
+
+def _strand_regexes(pattern: str, strand: Strand) -> Dict[Strand, str]:
+    return {s: iupac.to_regex(p) for s, p in _strand_patterns(pattern, strand).items()}
+
+
+class AsyncDNASequenceCollection(AsyncCollection[DNASequenceCollection]):
+    """
+    Async `DNASequenceCollection`, for the API; streams are iterated on the
+    event loop, holding no thread while waiting on the database.
+    """
+
+    def __init__(self, db: AsyncDBService = AsyncDBService()) -> None:
+        super().__init__(db, DNASequenceCollection(db))
+
+    async def get(self, id: int) -> DNASequence:
+        return await self._db.run(self._collection.__getitem__, id)
+
+    async def exists(self, id: int) -> bool:
+        return await self._db.run(self._collection.exists, id)
+
+    async def add(self, dna: DNASequence) -> Optional[DNASequence]:
+        return await self._db.run(self._collection.add, dna)
+
+    async def update(self, dna: List[DNASequence]) -> List[DNASequence]:
+        return await self._db.run(self._collection.update, dna)
+
+    def page(self, *args, **kwargs) -> AsyncIterator[DNASequence]:
+        return self._db.iterate(self._collection.page(*args, **kwargs))
+
+    def bases(self, *args, **kwargs) -> AsyncIterator[str]:
+        return self._db.iterate(self._collection.bases(*args, **kwargs))
+
+    def by_digest(self, *args, **kwargs) -> AsyncIterator[DNASequence]:
+        return self._db.iterate(self._collection.by_digest(*args, **kwargs))
+
+    def search(self, *args, **kwargs) -> AsyncIterator[DNASequenceSearchResult]:
+        return self._db.iterate(self._collection.search(*args, **kwargs))
+
+    def hits(self, *args, **kwargs) -> AsyncIterator[DNASequenceHit]:
+        return self._db.iterate(self._collection.hits(*args, **kwargs))
+
+    def regex_search(self, *args, **kwargs) -> AsyncIterator[DNASequenceSearchResult]:
+        return self._db.iterate(self._collection.regex_search(*args, **kwargs))
+
+    def multi_search(self, *args, **kwargs) -> AsyncIterator[DNASequencePatternHits]:
+        return self._db.iterate(self._collection.multi_search(*args, **kwargs))
+
+    def by_batch(self, *args, **kwargs) -> AsyncIterator[DNASequence]:
+        return self._db.iterate(self._collection.by_batch(*args, **kwargs))
+
+    def by_user(self, *args, **kwargs) -> AsyncIterator[DNASequence]:
+        return self._db.iterate(self._collection.by_user(*args, **kwargs))
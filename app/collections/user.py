@@ -1,13 +1,14 @@
 from functools import singledispatchmethod
-from typing import Collection, Iterator, List, Optional
+from typing import Collection, Dict, Iterable, Iterator, List, Optional
 from pydantic import BaseModel
 
-from sqlalchemy import Table, func, select
+from sqlalchemy import Table, column, func, select, union_all, values
 from sqlalchemy.dialects.postgresql import insert
-from app.collections.utils import as_records
+from app.collections.utils import AsyncCollection, as_records
 
 from app.models.user import User
-from app.services.db import DBService
+from app.services.cache import UserIdCache
+from app.services.db import AsyncDBService, DBService
 
 user: Table = DBService.user
 
@@ -19,12 +20,16 @@ class UserCollection(Collection[User]):
 
     def __init__(self, db: DBService = DBService()) -> None:
         self._db = db
+        self._ids = UserIdCache()
 
     def __enter__(self):
+        # statements of the block share a single connection and transaction
+        self._unit_of_work = self._db.unit_of_work()
+        self._unit_of_work.__enter__()
         return self
 
-    def __exit__(self, *_):
-        ...
+    def __exit__(self, *exc_info):
+        return self._unit_of_work.__exit__(*exc_info)
 
     def __contains__(self, obj: User) -> bool:
         return bool(
@@ -67,6 +72,63 @@ class UserCollection(Collection[User]):
             )
         )
 
+    def resolve(self, users: Iterable[User]) -> Dict[str, int]:
+        """
+        Returns the IDs of `users` by Benchling ID, adding those that do not
+        exist yet; users not cached (see `UserIdCache`) are added and
+        resolved in a single statement, and cached once committed.
+        """
+        users = {u.benchling_id: u for u in users}
+        ids = self._ids.get(users)
+        missing = [u for benchling_id, u in users.items() if benchling_id not in ids]
+
+        if not missing:
+            return ids
+
+        new_user = values(
+            column("benchling_id"), column("name"), column("handle"), name="new_user"
+        ).data([(u.benchling_id, u.name, u.handle) for u in missing])
+        inserted = (
+            insert(user)
+            .on_conflict_do_nothing(index_elements=[user.c.benchling_id])
+            .from_select(
+                [user.c.benchling_id, user.c.name, user.c.handle], select(new_user)
+            )
+            .returning(user.c.benchling_id, user.c.id)
+            .cte("inserted")
+        )
+
+        # existing users are not returned by the insertion, and inserted ones
+        # are not visible to the statement (sharing its snapshot)
+        resolved = dict(
+            self._db.execute(
+                union_all(
+                    select(inserted.c.benchling_id, inserted.c.id),
+                    select(user.c.benchling_id, user.c.id).join_from(
+                        new_user, user, new_user.c.benchling_id == user.c.benchling_id
+                    ),
+                )
+            ).all()
+        )
+
+        # users inserted concurrently, i.e. committed after the snapshot of
+        # the statement, are only visible to the next one
+        raced = [u.benchling_id for u in missing if u.benchling_id not in resolved]
+
+        if raced:
+            resolved.update(
+                self._db.execute(
+                    select(user.c.benchling_id, user.c.id).where(
+                        user.c.benchling_id.in_(raced)
+                    )
+                ).all()
+            )
+
+        # cached once committed, as a rollback would leave inserted IDs dangling
+        self._db.on_commit(lambda: self._ids.put(resolved))
+
+        return {**ids, **resolved}
+
     @singledispatchmethod
     def get(self, id: int, default: Optional[User] = None) -> User:
         record = self._db.execute(select(user).where(user.c.id == id)).one_or_none()
@@ -84,3 +146,24 @@ class UserCollection(Collection[User]):
             return User.from_orm(record)
 
         return self.add(default)
+
+
+class AsyncUserCollection(AsyncCollection[UserCollection]):
+    """
+    Async `UserCollection`, for the API.
+    """
+
+    def __init__(self, db: AsyncDBService = AsyncDBService()) -> None:
+        super().__init__(db, UserCollection(db))
+
+    async def all(self) -> List[User]:
+        return await self._db.run(lambda: list(self._collection))
+
+    async def get(self, id: int) -> User:
+        return await self._db.run(self._collection.__getitem__, id)
+
+    async def add(self, obj: User) -> User:
+        return await self._db.run(self._collection.add, obj)
+
+    async def update(self, users: List[User]) -> List[User]:
+        return await self._db.run(self._collection.update, users)
@@ -1,8 +1,32 @@
 from functools import partial
-from typing import Dict, List
+from typing import Dict, Generic, List, TypeVar
 
 from pydantic import BaseModel
 
+from app.services.db import AsyncDBService
+
+C = TypeVar("C")
+
 
 def as_records(objs: List[BaseModel], exclude=None) -> List[Dict]:
     return list(map(partial(BaseModel.dict, exclude=exclude), objs))
+
+
+class AsyncCollection(Generic[C]):
+    """
+    Async variant of a (sync) collection over `AsyncDBService`, whose methods
+    are run by `AsyncDBService.run` (or `iterate`, for streams).
+    """
+
+    def __init__(self, db: AsyncDBService, collection: C) -> None:
+        self._db = db
+        self._collection = collection
+
+    async def __aenter__(self):
+        # statements of the block share a single connection and transaction
+        self._unit_of_work = self._db.unit_of_work()
+        await self._db.run(self._unit_of_work.__enter__)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return await self._db.run(self._unit_of_work.__exit__, *exc_info)
@@ -1,4 +1,4 @@
-from pydantic import BaseSettings
+from pydantic import BaseSettings, conint
 
 
 class Config(BaseSettings):
@@ -6,3 +6,27 @@ class Config(BaseSettings):
     db_port: str = "5432"
     db_username: str = "postgres"
     db_password: str = "dna"
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    kmer_index: bool = False
+    # k-mers are encoded as 32-bit integers (see `app.search.kmer.encode`)
+    kmer_size: conint(ge=1, le=15) = 12
+    yield_per: int = 16
+    packed_bases: bool = False
+    lowercase_bases: bool = False
+    dedup_bases: bool = False
+    # bases of new sequences are also stored in chunks of this size, if not 0
+    chunk_size: int = 0
+    partitions: int = 0
+    copy_ingest: bool = True
+    merge_size: int = 1000
+    batch_chunk_size: int = 500
+    batch_lease: int = 300
+    validation_processes: int = 0
+    regex_timeout: float = 10
+    regex_limit: int = 1000
+    cache_size: int = 64 * 2**20
+    cache_backend: str = "local"
+    user_cache_size: int = 10000
+    slow_query_seconds: float = 0
+    profiling: bool = False
@@ -1,11 +1,16 @@
 from fastapi import FastAPI
 
 from app.context import Context
-from app.services.db import DBService
+from app.middleware import MetricsMiddleware, ProfilingMiddleware
+from app.services.db import AsyncDBService, DBService
+from app.routers.cache import router as cache_router
 from app.routers.dna import router as dna_router
+from app.routers.metrics import router as metrics_router
 from app.routers.user import router as user_router
 
 app = FastAPI()
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 context = Context()
 
 
@@ -22,10 +27,24 @@ def create_all():
     """
     Creates all tables defined by database service upon application start-up.
     """
+    """Adds pg_trgm extension for optimized infix pattern matching; must precede
+    creation of the `gin_trgm_ops` index."""
+    context.db.add_pg_trgm()
+
+    """Adds packed bases decoder; must precede creation of its trigram index."""
+    context.db.add_dna_unpack()
+
+    """Adds k-mer bucketing; must precede creation of the k-mer index."""
+    context.db.add_dna_kmer_buckets()
+
     context.db.create_all()
 
-    """Adds pg_trgm extension for optimized infix pattern matching."""
-    context.db.add_pg_trgm()
+    """Adds columns (and indexes) defined since existing tables were created;
+    backfilled by `python -m app.migrate`."""
+    context.db.add_columns()
+
+    """Adds server-side match offset function for hits-only search."""
+    context.db.add_dna_match_offsets()
 
 
 @app.on_event("shutdown")
@@ -36,5 +55,16 @@ def close_db():
     context.db.exit()
 
 
+@app.on_event("shutdown")
+async def close_async_db():
+    """
+    Closes and disposes of all connections of the async database service (used
+    by the API routers) upon application shutdown.
+    """
+    await AsyncDBService().aexit()
+
+
 app.include_router(dna_router)
 app.include_router(user_router)
+app.include_router(cache_router)
+app.include_router(metrics_router)
@@ -0,0 +1,122 @@
+"""
+ASGI middleware timing requests (see `services.metrics`) and profiling them
+on demand.
+"""
+import cProfile
+import io
+import pstats
+import time
+from threading import Lock
+from urllib.parse import parse_qs
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import Config
+from app.services import metrics
+
+# number of functions listed by request profiles
+PROFILE_LENGTH = 50
+
+
+class MetricsMiddleware:
+    """
+    Records the latency of each request, until its (possibly streamed)
+    response is sent, by method, route (path template) and status.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_timed(message: Message):
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+
+        finally:
+            # routes are set on the scope when matched; else unmatched paths
+            # would make for unbounded labels
+            route = scope.get("route")
+            metrics.http_request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests given a `profile` query parameter when `profiling` is
+    enabled, responding with the profile (by cumulative time) instead of
+    their response. Profiles cover the whole event loop thread, so include
+    concurrent requests; one request is profiled at a time.
+    """
+
+    def __init__(self, app: ASGIApp, config: Config = Config()) -> None:
+        self.app = app
+        self.config = config
+        self._lock = Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or not self.config.profiling
+            or "profile"
+            not in parse_qs(scope["query_string"].decode(), keep_blank_values=True)
+            or not self._lock.acquire(blocking=False)
+        ):
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_discarded(message: Message):
+            nonlocal status
+
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = cProfile.Profile()
+
+        try:
+            profiler.enable()
+
+            try:
+                await self.app(scope, receive, send_discarded)
+
+            finally:
+                profiler.disable()
+
+        finally:
+            self._lock.release()
+
+        report = io.StringIO()
+        report.write(f"{scope['method']} {scope['path']} -> {status}\n")
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(
+            PROFILE_LENGTH
+        )
+        body = report.getvalue().encode()
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,63 @@
+"""
+Migration command; backfills columns and indexes of sequences stored before
+they existed.
+
+Hashes, k-mer indexes and chunks the bases of such sequences in batches of
+`--batch-size` sequences, each committed on its own, so it can be
+interrupted and resumed, and runs alongside the API and batch workers:
+
+    python -m app.migrate --batch-size 100
+"""
+import logging
+from argparse import ArgumentParser
+from typing import Callable
+
+from app.collections.dna import DNASequenceCollection
+from app.services.db import DBService
+
+logger = logging.getLogger(__name__)
+
+# backfills, in order, each taking a batch size and returning the number of
+# sequences it processed (0 once done)
+BACKFILLS = {
+    "digest": DNASequenceCollection.digest,
+    "reindex": DNASequenceCollection.reindex,
+    "rechunk": DNASequenceCollection.rechunk,
+}
+
+
+def backfill(db: DBService, step: Callable, batch_size: int) -> int:
+    """
+    Runs backfill `step` in batches of `batch_size` sequences, each in a unit
+    of work of its own, until none is left; returns the number processed.
+    """
+    total = 0
+
+    while True:
+        with DNASequenceCollection(db) as dna:
+            count = step(dna, batch_size)
+
+        if not count:
+            return total
+
+        total += count
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    db = DBService()
+
+    try:
+        for name, step in BACKFILLS.items():
+            logger.info("%s: %d sequences", name, backfill(db, step, args.batch_size))
+
+    finally:
+        db.exit()
+
+
+if __name__ == "__main__":
+    main()
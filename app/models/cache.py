@@ -0,0 +1,21 @@
+from humps import camelize
+from pydantic import BaseModel
+
+
+class CacheStats(BaseModel):
+    """
+    Metrics of the search result and sequence cache; `stale` counts misses
+    of entries invalidated by added sequences, `size`/`capacity` are in bytes.
+    """
+
+    hits: int
+    misses: int
+    stale: int
+    evictions: int
+    entries: int
+    size: int
+    capacity: int
+
+    class Config:
+        alias_generator = camelize
+        allow_population_by_field_name = True
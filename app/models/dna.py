@@ -1,15 +1,35 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 
-from humps import camelize
-from pydantic import BaseModel, validator
+from humps import camelize, decamelize
+from pydantic import BaseModel, Field, conlist, constr, validator
+
+from app.config import Config
+from app.search import multi
+from app.services import metrics
 
 from .user import User
 
 # character set of DNA symbols as defined by IUPAC
 IUPAC_NUCLEOTIDE_SYMBOLS = set("ACGTUWSMKRYBDHVN".lower())
 
+# byte translation tables mapping IUPAC nucleotide symbols to themselves (or
+# their lowercase) and any other byte to NUL, i.e. validating in a single pass
+IUPAC_TABLE = bytes(
+    c if chr(c).lower() in IUPAC_NUCLEOTIDE_SYMBOLS else 0 for c in range(256)
+)
+IUPAC_LOWER_TABLE = bytes(
+    ord(chr(c).lower()) if chr(c).lower() in IUPAC_NUCLEOTIDE_SYMBOLS else 0
+    for c in range(256)
+)
+
+# whether validated bases are normalized to lowercase
+LOWERCASE_BASES = Config().lowercase_bases
+
+# (case-insensitive) regex of search patterns composed of IUPAC nucleotide symbols
+IUPAC_PATTERN = f"(?i)^[{''.join(sorted(IUPAC_NUCLEOTIDE_SYMBOLS))}]+$"
+
 
 class DNASequence(BaseModel):
     id: Optional[int]
@@ -25,11 +45,89 @@ class DNASequence(BaseModel):
         Check that `bases` is entirely composed of IUPAC
         nucleotide symbols; else raise `ValueError`
         """
-        if all(map(is_iupac, v.lower())):
-            return v
+        return check_bases(v, lower=LOWERCASE_BASES)
+
+    class Config:
+        alias_generator = camelize
+        allow_population_by_field_name = True
+        orm_mode = True
+
+
+class DNASequenceField(str, Enum):
+    ID = "id"
+    BENCHLING_ID = "benchlingId"
+    NAME = "name"
+    CREATED_AT = "createdAt"
+    BASES = "bases"
+    CREATOR = "creator"
+
+    @property
+    def field_name(self) -> str:
+        return decamelize(self.value)
+
+
+class Strand(str, Enum):
+    BOTH = "both"
+    FORWARD = "forward"
+    REVERSE = "reverse"
+
+
+class DNASequenceMatch(BaseModel):
+    """
+    Match of a search pattern; approximate matches also hold their `length`
+    and their `distance` (mismatches or edits) to the pattern.
+    """
+
+    strand: Strand
+    offset: int
+    length: Optional[int]
+    distance: Optional[int]
+
+    class Config:
+        alias_generator = camelize
+        allow_population_by_field_name = True
+        orm_mode = True
+
+
+class DNASequenceSearchResult(DNASequence):
+    """
+    `DNASequence` search hit; `matches` holds the offset (0-based, on the
+    forward strand) of the first match of the pattern on each strand.
+    """
+
+    matches: List[DNASequenceMatch] = []
+
+
+class DNASequenceHitMatch(DNASequenceMatch):
+    context: Optional[str]
 
-        else:
-            raise ValueError("invalid nucleotide symbol")
+
+class DNASequenceHit(BaseModel):
+    """
+    Hits-only search result; `matches` holds every match of the pattern,
+    with its flanking `context` when requested.
+    """
+
+    id: int
+    benchling_id: str
+    matches: List[DNASequenceHitMatch]
+
+    class Config:
+        alias_generator = camelize
+        allow_population_by_field_name = True
+        orm_mode = True
+
+
+class DNASequencePatternHits(BaseModel):
+    """
+    Result of a pattern of a multi-pattern search: the number of sequences
+    and matches it hit and, unless only counts were requested, its hits.
+    """
+
+    pattern: str
+    sequence_count: int = 0
+    match_count: int = 0
+    hits: Optional[List[DNASequenceHit]]
 
     class Config:
         alias_generator = camelize
@@ -40,16 +138,105 @@ class DNASequence(BaseModel):
 class Status(str, Enum):
     COMPLETED = "completed"
     INITIATED = "initiated"
+    PROCESSING = "processing"
     FAILED = "failed"
 
 
+class UploadFormat(str, Enum):
+    NDJSON = "ndjson"
+    FASTA = "fasta"
+
+
+class SearchEngine(str, Enum):
+    TRIGRAM = "trigram"
+    KMER = "kmer"
+
+
+class DNAMultiSearchRequest(BaseModel):
+    patterns: conlist(constr(regex=IUPAC_PATTERN), min_items=1, max_items=1000)
+    engine: SearchEngine = SearchEngine.TRIGRAM
+    strand: Strand = Strand.FORWARD
+    counts_only: bool = False
+    limit: Optional[int] = Field(None, ge=1, description="Hits returned per pattern")
+
+    @validator("patterns", each_item=True)
+    def check_expansions(cls, v):
+        """
+        Check that degenerate patterns expand to few enough strings to be
+        matched by an automaton; else raise `ValueError`
+        """
+        if multi.expansions(v) > multi.EXPANSION_LIMIT:
+            raise ValueError(
+                f"patterns may expand to at most {multi.EXPANSION_LIMIT} strings"
+            )
+
+        return v
+
+    @validator("strand", always=True)
+    def check_states(cls, v, values):
+        """
+        Check that the automaton of the panel (on `strand`) has few enough
+        states; else raise `ValueError`
+        """
+        strands = 2 if v is Strand.BOTH else 1
+
+        if multi.states(values.get("patterns", [])) * strands > multi.STATE_LIMIT:
+            raise ValueError(
+                f"panels may expand to at most {multi.STATE_LIMIT} states "
+                f"(the total length of their expansions, on every strand)"
+            )
+
+        return v
+
+    class Config:
+        alias_generator = camelize
+        allow_population_by_field_name = True
+
+
 class DNABatchResponse(BaseModel):
     id: int
 
 
 class DNABatchStatus(BaseModel):
     status: Status
+    processed: int = 0
+    inserted: int = 0
+    skipped_duplicates: int = 0
+    failed: int = 0
+
+    class Config:
+        alias_generator = camelize
+        allow_population_by_field_name = True
+        orm_mode = True
 
 
 def is_iupac(sym: str) -> bool:
     return sym in IUPAC_NUCLEOTIDE_SYMBOLS
+
+
+def check_bases(bases: str, lower: bool = False) -> str:
+    """
+    Returns `bases`, lowercased if `lower`, when entirely composed of IUPAC
+    nucleotide symbols; else raises `ValueError`. Bases are validated as bytes
+    in bulk rather than symbol by symbol.
+    """
+    try:
+        with metrics.validation_duration.time():
+            symbols = check_symbols(bases.encode("ascii"), lower)
+
+    except UnicodeEncodeError:
+        raise ValueError("invalid nucleotide symbol")
+
+    return symbols.decode("ascii") if lower else bases
+
+
+def check_symbols(symbols: bytes, lower: bool = False) -> bytes:
+    """
+    Byte counterpart of `check_bases`.
+    """
+    checked = symbols.translate(IUPAC_LOWER_TABLE if lower else IUPAC_TABLE)
+
+    if b"\0" in checked:
+        raise ValueError("invalid nucleotide symbol")
+
+    return checked
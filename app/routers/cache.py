@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from app.models.cache import CacheStats
+from app.routers.tags import Tags
+from app.services.cache import CacheService
+from app.services.db import AsyncDBService
+
+router = APIRouter()
+
+
+@router.get(
+    "/cache/stats",
+    operation_id="getCacheStats",
+    summary="Get hit/miss metrics of the search result and sequence cache",
+    tags=[Tags.CACHE],
+)
+async def get_cache_stats() -> CacheStats:
+    db = AsyncDBService()
+    return CacheStats(**await db.run(CacheService().stats, db))
@@ -1,11 +1,33 @@
 from typing import List, Literal, Optional
-from fastapi import APIRouter, BackgroundTasks
 
-from app.collections.dna import DNASequenceCollection
-from app.models.dna import DNABatchResponse, DNABatchStatus, DNASequence
+from fastapi import APIRouter, File, HTTPException, Path, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+
+from app.collections.dna import (
+    AsyncDNASequenceCollection,
+    min_seed_length,
+    unfiltered,
+)
+from app.models.dna import (
+    DNABatchResponse,
+    DNABatchStatus,
+    DNAMultiSearchRequest,
+    IUPAC_PATTERN,
+    DNASequence,
+    DNASequenceField,
+    DNASequenceHit,
+    DNASequencePatternHits,
+    DNASequenceSearchResult,
+    SearchEngine,
+    Strand,
+    UploadFormat,
+)
 from app.routers.tags import Tags
-from app.services.db import DBService
-from app.tasks import dna_sequences_batch_update
+from app.routers.utils import projection, stream
+from app.search import approximate
+from app.search import regex as search_regex
+from app.services import formats
+from app.services.db import AsyncDBService, DBService
 
 router = APIRouter()
 
@@ -15,10 +37,21 @@ router = APIRouter()
     operation_id="listDnaSequences",
     summary="Get all DNA Sequences",
     tags=[Tags.DNA],
+    response_model=List[DNASequence],
 )
-def list_dna_sequences() -> List[DNASequence]:
-    with DNASequenceCollection() as dna:
-        return list(dna)
+async def list_dna_sequences(
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[List[DNASequenceField]] = Query(
+        None, description="Fields to return; all when omitted"
+    ),
+    exclude: Optional[List[DNASequenceField]] = Query(
+        None, description="Fields to omit, e.g. `bases`"
+    ),
+) -> StreamingResponse:
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(dna.page(after_id, limit, projection(fields, exclude)), request)
 
 
 @router.get(
@@ -27,9 +60,62 @@ def list_dna_sequences() -> List[DNASequence]:
     summary="Get a DNA Sequence by ID",
     tags=[Tags.DNA],
 )
-def get_dna_sequence(id: int) -> DNASequence:
-    with DNASequenceCollection() as dna:
-        return dna[id]
+async def get_dna_sequence(id: int) -> DNASequence:
+    async with AsyncDNASequenceCollection() as dna:
+        return await dna.get(id)
+
+
+@router.get(
+    "/dna/sha256/{digest}",
+    operation_id="listDnaSequencesBySha256",
+    summary="Get DNA Sequences with identical bases, by content hash",
+    tags=[Tags.DNA],
+    response_model=List[DNASequence],
+)
+async def list_dna_sequences_by_sha256(
+    request: Request,
+    digest: str = Path(
+        ...,
+        regex="^[0-9a-fA-F]{64}$",
+        description="SHA-256 (hex) of the lowercase bases",
+    ),
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[List[DNASequenceField]] = Query(
+        None, description="Fields to return; all when omitted"
+    ),
+    exclude: Optional[List[DNASequenceField]] = Query(
+        None, description="Fields to omit, e.g. `bases`"
+    ),
+) -> StreamingResponse:
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(
+            dna.by_digest(
+                bytes.fromhex(digest), after_id, limit, projection(fields, exclude)
+            ),
+            request,
+        )
+
+
+@router.get(
+    "/dna/{id}/bases",
+    operation_id="getDnaSequenceBases",
+    summary="Get (a range of) the bases of a DNA Sequence",
+    tags=[Tags.DNA],
+    response_class=StreamingResponse,
+)
+async def get_dna_sequence_bases(
+    id: int,
+    start: int = Query(0, ge=0, description="Offset of the first base (0-based)"),
+    end: Optional[int] = Query(
+        None, ge=0, description="Offset after the last base; end of sequence if omitted"
+    ),
+) -> StreamingResponse:
+    async with AsyncDNASequenceCollection() as dna:
+        if not await dna.exists(id):
+            raise HTTPException(404, "DNA Sequence not found")
+
+        return StreamingResponse(dna.bases(id, start, end), media_type="text/plain")
 
 
 @router.get(
@@ -37,10 +123,152 @@ def get_dna_sequence(id: int) -> DNASequence:
     operation_id="dnaSequenceSearch",
     summary="Search for DNA Sequences by pattern",
     tags=[Tags.DNA],
+    response_model=List[DNASequenceSearchResult],
+)
+async def dna_sequence_search(
+    request: Request,
+    pattern: str = Query(
+        regex=IUPAC_PATTERN,
+        description="IUPAC nucleotide pattern; ambiguity codes (e.g. `N`, `R`) match any base they denote",
+    ),
+    engine: SearchEngine = SearchEngine.TRIGRAM,
+    strand: Strand = Strand.FORWARD,
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+    max_mismatches: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Match approximately, with up to this many substitutions",
+    ),
+    max_edits: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Match approximately, with up to this many substitutions, insertions or deletions",
+    ),
+) -> StreamingResponse:
+    _check_engine(engine)
+    _check_errors(pattern, engine, max_mismatches, max_edits)
+
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(
+            dna.search(
+                pattern,
+                engine,
+                strand,
+                after_id=after_id,
+                limit=limit,
+                max_mismatches=max_mismatches,
+                max_edits=max_edits,
+            ),
+            request,
+        )
+
+
+@router.get(
+    "/dna/search/hits",
+    operation_id="dnaSequenceSearchHits",
+    summary="Search for DNA Sequence match positions by pattern",
+    tags=[Tags.DNA],
+    response_model=List[DNASequenceHit],
 )
-def dna_sequence_search(pattern: str) -> List[DNASequence]:
-    with DNASequenceCollection() as dna:
-        return list(dna.search(pattern))
+async def dna_sequence_search_hits(
+    request: Request,
+    pattern: str = Query(
+        regex=IUPAC_PATTERN,
+        description="IUPAC nucleotide pattern; ambiguity codes (e.g. `N`, `R`) match any base they denote",
+    ),
+    engine: SearchEngine = SearchEngine.TRIGRAM,
+    strand: Strand = Strand.FORWARD,
+    flank: Optional[int] = Query(
+        None, ge=0, description="Number of flanking bases returned as context"
+    ),
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+    max_mismatches: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Match approximately, with up to this many substitutions",
+    ),
+    max_edits: Optional[int] = Query(
+        None,
+        ge=0,
+        description="Match approximately, with up to this many substitutions, insertions or deletions",
+    ),
+) -> StreamingResponse:
+    _check_engine(engine)
+    _check_errors(pattern, engine, max_mismatches, max_edits)
+
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(
+            dna.hits(
+                pattern,
+                engine,
+                strand,
+                flank,
+                after_id=after_id,
+                limit=limit,
+                max_mismatches=max_mismatches,
+                max_edits=max_edits,
+            ),
+            request,
+        )
+
+
+@router.get(
+    "/dna/search/regex",
+    operation_id="dnaSequenceRegexSearch",
+    summary="Search for DNA Sequences by (restricted) regex",
+    tags=[Tags.DNA],
+    response_model=List[DNASequenceSearchResult],
+)
+async def dna_sequence_regex_search(
+    request: Request,
+    regex: str = Query(
+        max_length=1000,
+        description="Regex of IUPAC nucleotide symbols, character classes (`[AC]`), `.`, groups with alternation (`(GAA|GAG)`), bounded repeats (`?`, `{m}`, `{m,n}`) and anchors",
+    ),
+    engine: SearchEngine = SearchEngine.TRIGRAM,
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+) -> StreamingResponse:
+    _check_engine(engine)
+
+    try:
+        compiled = search_regex.compile(regex)
+
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(
+            dna.regex_search(compiled, engine, after_id=after_id, limit=limit), request
+        )
+
+
+@router.post(
+    "/dna/search:multi",
+    operation_id="dnaSequenceMultiSearch",
+    summary="Search for DNA Sequences by many patterns at once, e.g. a primer panel",
+    tags=[Tags.DNA],
+    response_model=List[DNASequencePatternHits],
+)
+async def dna_sequence_multi_search(
+    search: DNAMultiSearchRequest, request: Request
+) -> StreamingResponse:
+    _check_engine(search.engine)
+    _check_panel(search.patterns, search.engine)
+
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(
+            dna.multi_search(
+                search.patterns,
+                search.engine,
+                search.strand,
+                counts_only=search.counts_only,
+                limit=search.limit,
+            ),
+            request,
+        )
 
 
 @router.get(
@@ -48,10 +276,16 @@ def dna_sequence_search(pattern: str) -> List[DNASequence]:
     operation_id="listBatch",
     summary="Get DNA Sequences by Batch ID",
     tags=[Tags.DNA],
+    response_model=List[DNASequence],
 )
-def list_batch(id: int) -> List[DNASequence]:
-    with DNASequenceCollection() as dna:
-        return list(dna.by_batch(id))
+async def list_batch(
+    id: int,
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+) -> StreamingResponse:
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(dna.by_batch(id, after_id, limit), request)
 
 
 @router.get(
@@ -60,12 +294,12 @@ def list_batch(id: int) -> List[DNASequence]:
     summary="Get upload status of DNA Sequence Batch",
     tags=[Tags.DNA],
 )
-def get_batch_status(id: int) -> Optional[DNABatchStatus]:
-    with DBService() as db:
-        response = db.get_batch_status(id)
+async def get_batch_status(id: int) -> Optional[DNABatchStatus]:
+    db = AsyncDBService()
+    response = await db.run(db.get_batch_status, id)
 
-        if response:
-            return DNABatchStatus(status=response)
+    if response:
+        return DNABatchStatus.from_orm(response)
 
 
 @router.post(
@@ -74,9 +308,9 @@ def get_batch_status(id: int) -> Optional[DNABatchStatus]:
     summary="Create a DNA Sequence",
     tags=[Tags.DNA],
 )
-def create_dna_sequence(dna: DNASequence):
-    with DNASequenceCollection() as sequences:
-        return sequences.add(dna)
+async def create_dna_sequence(dna: DNASequence):
+    async with AsyncDNASequenceCollection() as sequences:
+        return await sequences.add(dna)
 
 
 @router.post(
@@ -85,9 +319,9 @@ def create_dna_sequence(dna: DNASequence):
     summary="Create DNA Sequences in bulk",
     tags=[Tags.DNA],
 )
-def bulk_create_dna_sequences(dna: List[DNASequence]):
-    with DNASequenceCollection() as sequences:
-        return sequences.update(dna)
+async def bulk_create_dna_sequences(dna: List[DNASequence]):
+    async with AsyncDNASequenceCollection() as sequences:
+        return await sequences.update(dna)
 
 
 @router.post(
@@ -96,15 +330,95 @@ def bulk_create_dna_sequences(dna: List[DNASequence]):
     summary="Upload a DNA Sequence Batch for processing",
     tags=[Tags.DNA],
 )
-def create_dna_sequence_batch(
-    dna: List[DNASequence], background_tasks: BackgroundTasks
+async def create_dna_sequence_batch(dna: List[DNASequence]) -> DNABatchResponse:
+    db = AsyncDBService()
+
+    # spools and queues the batch for processing by the batch workers
+    return DNABatchResponse(id=await db.run(db.init_batch, (d.json() for d in dna)))
+
+
+@router.post(
+    "/dna/batch:upload",
+    operation_id="uploadDNASequenceBatch",
+    summary="Upload a DNA Sequence Batch file (NDJSON, or FASTA with NDJSON metadata) for processing",
+    tags=[Tags.DNA],
+)
+def upload_dna_sequence_batch(
+    file: UploadFile = File(..., description="Sequences (NDJSON or FASTA)"),
+    metadata: Optional[UploadFile] = File(
+        None, description="NDJSON metadata of each FASTA record, in record order"
+    ),
+    format: UploadFormat = Query(UploadFormat.NDJSON),
 ) -> DNABatchResponse:
+    # decoded line by line; spooled uploads are not readable text streams
+    # (through `TextIOWrapper`) before Python 3.11
+    lines = formats.decoded(file.file)
+
+    if format == UploadFormat.NDJSON:
+        items = formats.ndjson_items(lines)
+
+    elif metadata:
+        items = formats.fasta_items(lines, formats.decoded(metadata.file))
+
+    else:
+        raise HTTPException(422, "FASTA uploads require a metadata file")
+
+    # parsing is CPU-bound, so runs on the threadpool with the sync service
     with DBService() as db:
-        batch_id = db.init_batch()
+        # parsed (spooled on disk) upload is copied item by item into the batch
+        return DNABatchResponse(id=db.init_batch(items))
 
-        # queues a task for uploading the batch from background processing
-        background_tasks.add_task(
-            dna_sequences_batch_update, batch_id=batch_id, dna_list=dna
-        )
 
+@router.post(
+    "/dna/batch/{id}:resume",
+    operation_id="resumeDNASequenceBatch",
+    summary="Queue a failed DNA Sequence Batch to resume from its last committed chunk",
+    tags=[Tags.DNA],
+)
+async def resume_dna_sequence_batch(id: int) -> Optional[DNABatchResponse]:
+    db = AsyncDBService()
+    batch_id = await db.run(db.requeue_batch, id)
+
+    if batch_id:
         return DNABatchResponse(id=batch_id)
+
+
+def _check_engine(engine: SearchEngine):
+    if engine is SearchEngine.KMER and not AsyncDBService().config.kmer_index:
+        raise HTTPException(422, "the kmer engine requires KMER_INDEX to be set")
+
+
+def _check_panel(patterns: List[str], engine: SearchEngine):
+    # a single pattern the index cannot shortlist by would scan every sequence
+    config = AsyncDBService().config
+    rejected = unfiltered(patterns, engine, config)
+
+    if rejected:
+        raise HTTPException(
+            422,
+            f"patterns need a literal run of at least "
+            f"{min_seed_length(engine, config)} bases for the {engine.value} "
+            f"engine: {', '.join(rejected[:10])}",
+        )
+
+
+def _check_errors(
+    pattern: str,
+    engine: SearchEngine,
+    max_mismatches: Optional[int],
+    max_edits: Optional[int],
+):
+    if max_mismatches is not None and max_edits is not None:
+        raise HTTPException(422, "max_mismatches and max_edits are exclusive")
+
+    errors = max_edits if max_mismatches is None else max_mismatches
+    # seeds shorter than the index of `engine` would be scanned for
+    min_length = min_seed_length(engine, AsyncDBService().config)
+    allowed = approximate.max_errors(len(pattern), min_length)
+
+    if errors is not None and errors > allowed:
+        raise HTTPException(
+            422,
+            f"at most {allowed} errors are allowed for this pattern with the "
+            f"{engine.value} engine, i.e. for seeds of at least {min_length} bases",
+        )
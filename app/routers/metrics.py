@@ -0,0 +1,82 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.routers.tags import Tags
+from app.services import metrics
+from app.services.cache import CacheService, UserIdCache
+from app.services.db import AsyncDBService
+
+router = APIRouter()
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# batch progress counts, by outcome
+BATCH_OUTCOMES = ("inserted", "skipped_duplicates", "failed")
+
+
+@router.get(
+    "/metrics",
+    operation_id="getMetrics",
+    summary="Get service metrics in the Prometheus text format",
+    tags=[Tags.METRICS],
+    response_class=PlainTextResponse,
+)
+async def get_metrics() -> PlainTextResponse:
+    db = AsyncDBService()
+
+    # collectors query the database, so run on the async engine
+    return PlainTextResponse(
+        await db.run(metrics.REGISTRY.render), media_type=CONTENT_TYPE
+    )
+
+
+@metrics.REGISTRY.collector(
+    "dna_batches", "Batches by status; `initiated` batches are queued."
+)
+def _batches():
+    for row in AsyncDBService().get_batch_totals():
+        yield {"status": row.status.value}, row.batches
+
+
+@metrics.REGISTRY.collector(
+    "dna_batch_items_total",
+    "Batch items processed, by outcome; their rate is the batch ingest rate.",
+    type="counter",
+)
+def _batch_items():
+    totals = dict.fromkeys(BATCH_OUTCOMES, 0)
+
+    for row in AsyncDBService().get_batch_totals():
+        for outcome in BATCH_OUTCOMES:
+            totals[outcome] += getattr(row, outcome)
+
+    for outcome, total in totals.items():
+        yield {"outcome": outcome}, total
+
+
+@metrics.REGISTRY.collector(
+    "db_pool_connections", "Connections of the (async) pool of the API, by state."
+)
+def _pool_connections():
+    for state, count in AsyncDBService().pool_status().items():
+        yield {"state": state}, count
+
+
+@metrics.REGISTRY.collector(
+    "dna_cache", "Search result and sequence cache metrics (see /cache/stats)."
+)
+def _cache():
+    db = AsyncDBService()
+
+    if db.config.cache_size:
+        for name, value in CacheService().stats(db).items():
+            yield {"metric": name}, value
+
+
+@metrics.REGISTRY.collector(
+    "dna_user_cache", "Cache of user IDs resolved on ingest, by metric."
+)
+def _user_cache():
+    for name, value in UserIdCache().stats().items():
+        yield {"metric": name}, value
@@ -1,3 +1,5 @@
 class Tags:
     DNA: str = "dna"
     USER: str = "user"
+    CACHE: str = "cache"
+    METRICS: str = "metrics"
@@ -1,11 +1,13 @@
-from typing import List
-from fastapi import APIRouter
-from app.collections.dna import DNASequenceCollection
-from app.collections.user import UserCollection
-from app.models.dna import DNASequence
+from typing import List, Optional
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from app.collections.dna import AsyncDNASequenceCollection
+from app.collections.user import AsyncUserCollection
+from app.models.dna import DNASequence, DNASequenceField
 
 from app.models.user import User
 from app.routers.tags import Tags
+from app.routers.utils import projection, stream
 
 router = APIRouter()
 
@@ -13,9 +15,9 @@ router = APIRouter()
 @router.get(
     "/users", operation_id="listUsers", summary="Get all Users", tags=[Tags.USER]
 )
-def list_all_users() -> List[User]:
-    with UserCollection() as users:
-        return list(users)
+async def list_all_users() -> List[User]:
+    async with AsyncUserCollection() as users:
+        return await users.all()
 
 
 @router.get(
@@ -24,9 +26,9 @@ def list_all_users() -> List[User]:
     summary="Get a User by ID",
     tags=[Tags.USER],
 )
-def get_user(id: int) -> User:
-    with UserCollection() as users:
-        return users[id]
+async def get_user(id: int) -> User:
+    async with AsyncUserCollection() as users:
+        return await users.get(id)
 
 
 @router.get(
@@ -34,21 +36,35 @@ def get_user(id: int) -> User:
     operation_id="listSequencesByUser",
     summary="Get all DNA Sequences by User ID",
     tags=[Tags.USER],
+    response_model=List[DNASequence],
 )
-def list_sequences_by_user(id: int) -> DNASequence:
-    with DNASequenceCollection() as dna:
-        return list(dna.by_user(id))
+async def list_sequences_by_user(
+    id: int,
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Return sequences after this ID"),
+    limit: Optional[int] = Query(None, ge=1),
+    fields: Optional[List[DNASequenceField]] = Query(
+        None, description="Fields to return; all when omitted"
+    ),
+    exclude: Optional[List[DNASequenceField]] = Query(
+        None, description="Fields to omit, e.g. `bases`"
+    ),
+) -> StreamingResponse:
+    async with AsyncDNASequenceCollection() as dna:
+        return stream(
+            dna.by_user(id, after_id, limit, projection(fields, exclude)), request
+        )
 
 
 @router.post(
     "/users", operation_id="createUser", summary="Create a User", tags=[Tags.USER]
 )
-def create_user(user: User):
-    with UserCollection() as users:
-        return users.add(user)
+async def create_user(user: User):
+    async with AsyncUserCollection() as users:
+        return await users.add(user)
 
 
 @router.post("/users:bulk", operation_id="bulkCreateUsers", summary="Create Users in bulk", tags=[Tags.USER])
-def bulk_create_users(user_list: List[User]):
-    with UserCollection() as users:
-        return users.update(user_list)
+async def bulk_create_users(user_list: List[User]):
+    async with AsyncUserCollection() as users:
+        return await users.update(user_list)
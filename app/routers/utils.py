@@ -0,0 +1,59 @@
+from typing import AsyncIterable, AsyncIterator, List, Optional, Set
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from app.models.dna import DNASequenceField
+from app.services import metrics
+
+NDJSON = "application/x-ndjson"
+
+
+def stream(models: AsyncIterable[BaseModel], request: Request) -> StreamingResponse:
+    """
+    Streams `models` one at a time as NDJSON when the client accepts it; else
+    as a chunked JSON array, so responses are never materialized in memory;
+    only fields set on each model are serialized (see `projection`).
+    """
+    if NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson(models), media_type=NDJSON)
+
+    return StreamingResponse(_json_array(models), media_type="application/json")
+
+
+def projection(
+    fields: Optional[List[DNASequenceField]],
+    exclude: Optional[List[DNASequenceField]],
+) -> Optional[Set[str]]:
+    """
+    Resolves the `DNASequence` field names selected by the `fields`/`exclude`
+    query parameters; `None` when neither is given.
+    """
+    if fields is None and exclude is None:
+        return None
+
+    return {f.field_name for f in fields or DNASequenceField} - {
+        f.field_name for f in exclude or ()
+    }
+
+
+async def _ndjson(models: AsyncIterable[BaseModel]) -> AsyncIterator[str]:
+    async for model in models:
+        with metrics.encoding_duration.time():
+            line = model.json(by_alias=True, exclude_unset=True) + "\n"
+
+        yield line
+
+
+async def _json_array(models: AsyncIterable[BaseModel]) -> AsyncIterator[str]:
+    separator = "["
+
+    async for model in models:
+        with metrics.encoding_duration.time():
+            item = separator + model.json(by_alias=True, exclude_unset=True)
+
+        yield item
+        separator = ","
+
+    yield "[]" if separator == "[" else "]"
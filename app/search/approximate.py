@@ -0,0 +1,150 @@
+from typing import Dict, Iterator, List, Set, Tuple
+
+from app.search import iupac
+
+
+def max_errors(length: int, min_length: int = 1) -> int:
+    """
+    Returns the most errors a pattern of `length` bases may be searched with
+    while its seeds (see `seeds`) are at least `min_length` bases long, e.g.
+    long enough to be looked up in an index; exact search is always allowed.
+    """
+    return max(length // min_length - 1, 0)
+
+
+def seeds(pattern: str, errors: int, min_length: int = 1) -> List[Tuple[int, str]]:
+    """
+    Splits `pattern` into `errors + 1` (offset, piece) seeds, each at least
+    `min_length` bases long; by the pigeonhole principle, any match of
+    `pattern` with at most `errors` mismatches or edits contains at least one
+    piece exactly.
+    """
+    allowed = max_errors(len(pattern), min_length)
+
+    if errors > allowed:
+        raise ValueError(
+            f"at most {allowed} errors are allowed, for seeds of at least "
+            f"{min_length} bases"
+        )
+
+    bounds = [i * len(pattern) // (errors + 1) for i in range(errors + 2)]
+
+    return [(start, pattern[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+
+def mismatches(
+    pattern: str, text: str, max_mismatches: int
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yields the (offset, mismatches) of every alignment of `pattern` in `text`
+    with at most `max_mismatches` mismatches.
+    """
+    classes = _classes(pattern)
+
+    for offset in range(len(text) - len(pattern) + 1):
+        count = 0
+
+        for symbols, base in zip(classes, text[offset : offset + len(pattern)]):
+            if base not in symbols:
+                count += 1
+
+                if count > max_mismatches:
+                    break
+
+        else:
+            yield offset, count
+
+
+def edits(pattern: str, text: str, max_edits: int) -> Iterator[Tuple[int, int, int]]:
+    """
+    Yields the (offset, length, edits) of the best match of `pattern` in
+    `text` per run of overlapping matches with at most `max_edits` edits.
+    Match ends are found with Myers' bit-parallel algorithm in a single pass
+    over `text`; the start of each match by a second (anchored) pass over the
+    reversed text preceding its end.
+    """
+    peq = _peq(pattern)
+    best = None
+
+    for end, distance in _ends(peq, len(pattern), text, anchored=False):
+        if distance <= max_edits:
+            if best is None or distance < best[1]:
+                best = (end, distance)
+
+        elif best is not None:
+            yield _located(pattern, text, max_edits, *best)
+            best = None
+
+    if best is not None:
+        yield _located(pattern, text, max_edits, *best)
+
+
+def _located(
+    pattern: str, text: str, max_edits: int, end: int, distance: int
+) -> Tuple[int, int, int]:
+    """
+    Returns the (offset, length, edits) of the shortest match of `pattern`
+    ending at `end` of `text` with `distance` edits, i.e. the first match of
+    the reversed pattern, anchored at `end`, over the reversed text.
+    """
+    span = len(pattern) + max_edits
+    prefix = text[max(end + 1 - span, 0) : end + 1][::-1]
+    ends = _ends(_peq(pattern[::-1]), len(pattern), prefix, anchored=True)
+    length = 1 + next(i for i, d in ends if d == distance)
+
+    return end + 1 - length, length, distance
+
+
+def _ends(
+    peq: Dict[str, int], m: int, text: str, anchored: bool
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yields the edit distance between the pattern of `peq` (of length `m`) and
+    the best match ending at each offset of `text`; matches start anywhere in
+    `text` unless `anchored` at its start.
+    """
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, distance = mask, 0, m
+
+    for end, base in enumerate(text):
+        eq = peq.get(base, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (mask & ~(xh | pv))
+        mh = pv & xh
+
+        if ph & last:
+            distance += 1
+
+        elif mh & last:
+            distance -= 1
+
+        # the first row is 0 (free start) or the offset (anchored start)
+        ph = ((ph << 1) | anchored) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (mask & ~(xv | ph))
+        mv = ph & xv
+
+        yield end, distance
+
+
+def _classes(pattern: str) -> List[Set[str]]:
+    """
+    Returns the set of bases matched by each symbol of `pattern` (see
+    `iupac.symbol_class`).
+    """
+    return [set(iupac.symbol_class(s).strip("[]")) for s in pattern]
+
+
+def _peq(pattern: str) -> Dict[str, int]:
+    """
+    Returns the bitmask of the positions of `pattern` matching each base.
+    """
+    peq = {}
+
+    for i, symbols in enumerate(_classes(pattern)):
+        for base in symbols:
+            peq[base] = peq.get(base, 0) | 1 << i
+
+    return peq
@@ -0,0 +1,66 @@
+from typing import Dict
+
+# nucleotides denoted by each IUPAC symbol
+IUPAC_CODES: Dict[str, str] = {
+    "a": "a",
+    "c": "c",
+    "g": "g",
+    "t": "t",
+    "u": "t",
+    "w": "at",
+    "s": "cg",
+    "m": "ac",
+    "k": "gt",
+    "r": "ag",
+    "y": "ct",
+    "b": "cgt",
+    "d": "agt",
+    "h": "act",
+    "v": "acg",
+    "n": "acgt",
+}
+
+
+# complement of each IUPAC symbol; ambiguity codes complement to the code of
+# the complemented nucleotides (e.g. R = A/G -> Y = C/T)
+IUPAC_COMPLEMENTS: Dict[str, str] = dict(zip("acgtuwsmkrybdhvn", "tgcaawskmyrvhdbn"))
+
+
+def symbol_class(symbol: str) -> str:
+    """
+    Returns the regex matching a single IUPAC `symbol`: unambiguous nucleotides
+    match themselves, ambiguity codes match the nucleotides they denote as
+    well as the code itself.
+    """
+    nucleotides = IUPAC_CODES.get(symbol.lower())
+
+    if nucleotides is None:
+        raise ValueError(f"invalid nucleotide symbol: {symbol!r}")
+
+    if nucleotides == symbol.lower():
+        return nucleotides
+
+    return f"[{''.join(sorted(set(nucleotides + symbol.lower())))}]"
+
+
+def to_regex(pattern: str) -> str:
+    """
+    Compiles a (possibly degenerate) IUPAC `pattern` into a case-insensitive
+    regex, so every expansion is matched by a single automaton rather than
+    enumerated; e.g. `GANTC` -> `ga[acgnt]tc`.
+    """
+    return "".join(map(symbol_class, pattern))
+
+
+def reverse_complement(pattern: str) -> str:
+    """
+    Returns the reverse complement of an IUPAC `pattern`, i.e. the pattern as
+    read on the opposite strand.
+    """
+    try:
+        return "".join(
+            IUPAC_COMPLEMENTS[symbol] for symbol in reversed(pattern.lower())
+        )
+
+    except KeyError as e:
+        raise ValueError(f"invalid nucleotide symbol: {e.args[0]!r}") from None
@@ -0,0 +1,115 @@
+import re
+from itertools import repeat
+from typing import Iterator, List, Optional
+
+from sqlalchemy import FromClause, Integer, Select, Table, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.services.db import KMER_BUCKET_K, DBService
+
+dna_kmer: Table = DBService.dna_kmer
+
+# nucleotides covered by the k-mer index; k-mers with ambiguity codes are not indexed
+KMER_NUCLEOTIDES = "acgt"
+
+# k-mers per row of the index; the sorted k-mers of a sequence are split into
+# rows small enough to be stored inline rather than TOASTed, so the planner
+# costs scanning the index by its actual size
+KMER_BLOCK_SIZE = 400
+
+_SEGMENTS = re.compile(f"[{KMER_NUCLEOTIDES}{KMER_NUCLEOTIDES.upper()}]+")
+_TO_DIGITS = str.maketrans(KMER_NUCLEOTIDES + KMER_NUCLEOTIDES.upper(), "0123" * 2)
+
+
+def encode(kmer: str) -> int:
+    """
+    Encodes unambiguous `kmer` as a base 4 integer, i.e. 2 bits per
+    nucleotide; k-mers of up to 15 nucleotides fit the (32-bit) index.
+    """
+    return int(kmer.translate(_TO_DIGITS), 4)
+
+
+def kmers(pattern: str, k: int) -> List[int]:
+    """
+    Returns the (encoded) k-mers covering every unambiguous segment of
+    `pattern` that is at least `k` bases long; overlapping k-mers add nothing
+    to the posting list intersection, so segments are tiled with a stride of
+    `k`.
+    """
+    keys = set()
+
+    for segment in _SEGMENTS.findall(pattern):
+        if len(segment) >= k:
+            keys.update(
+                encode(segment[i : i + k]) for i in range(0, len(segment) - k + 1, k)
+            )
+            keys.add(encode(segment[-k:]))
+
+    return sorted(keys)
+
+
+def extract(bases: str, k: int) -> List[int]:
+    """
+    Returns every distinct unambiguous k-mer of `bases`, encoded, in order.
+    """
+    keys = set()
+
+    for segment in _SEGMENTS.findall(bases):
+        digits = segment.translate(_TO_DIGITS)
+        keys.update(
+            map(int, (digits[i : i + k] for i in range(len(digits) - k + 1)), repeat(4))
+        )
+
+    return sorted(keys)
+
+
+def bucket(key: int, k: int) -> int:
+    """
+    Returns the bucket of encoded k-mer `key`, its prefix of (at most)
+    `KMER_BUCKET_K` nucleotides; the GIN index is keyed by bucket, so it
+    holds fewer, longer (compressed) posting lists than one per k-mer, and
+    the rows of a bucket are rechecked for the k-mer itself.
+    """
+    return key >> 2 * max(k - KMER_BUCKET_K, 0)
+
+
+def blocks(id: int, k: int, keys: List[int]) -> Iterator[tuple]:
+    """
+    Yields the rows of the index holding the (sorted) k-mers `keys` of
+    sequence `id`, `KMER_BLOCK_SIZE` per row; each k-mer is held by a
+    single row.
+    """
+    for block, start in enumerate(range(0, len(keys), KMER_BLOCK_SIZE)):
+        yield id, block, k, keys[start : start + KMER_BLOCK_SIZE]
+
+
+def candidates(
+    pattern: str, k: int, postings: FromClause = dna_kmer
+) -> Optional[Select]:
+    """
+    Selects IDs of sequences whose posting lists (in `postings`, e.g. a
+    partition of the index) contain every k-mer of `pattern`; `None` when
+    `pattern` has no indexable k-mer.
+    """
+    keys = kmers(pattern, k)
+
+    if not keys:
+        return None
+
+    # each k-mer is held by a single row of a sequence, so sequences holding
+    # every k-mer are selected by a (semi-join) lookup per k-mer
+    statement = None
+
+    for key in keys:
+        p = postings.alias()
+        buckets = func.dna_kmer_buckets(p.c.kmers, p.c.k, type_=ARRAY(Integer))
+        lookup = select(p.c.dna_sequence_id).where(
+            buckets.contains([bucket(key, k)]), p.c.k == k, p.c.kmers.contains([key])
+        )
+
+        if statement is not None:
+            lookup = lookup.where(p.c.dna_sequence_id.in_(statement))
+
+        statement = lookup
+
+    return statement
@@ -0,0 +1,119 @@
+"""
+Multi-pattern matching of IUPAC patterns with an Aho-Corasick automaton: the
+matches of every pattern in a set (e.g. a primer panel) are found in a single
+pass over the bases, in time linear in the bases and the matches.
+"""
+from collections import deque
+from itertools import product
+from math import prod
+from typing import Dict, Hashable, Iterable, Iterator, List, Mapping, Tuple
+
+from app.search import iupac
+
+# largest number of strings a degenerate pattern expands to; each is a path
+# of the automaton
+EXPANSION_LIMIT = 256
+
+# largest number of states of the automaton of a panel (bounded by `states`);
+# each holds a transition for every symbol of the alphabet
+STATE_LIMIT = 2**16
+
+# symbols of stored bases, i.e. the alphabet of the automaton
+ALPHABET = "".join(iupac.IUPAC_CODES)
+
+
+def expansions(pattern: str) -> int:
+    """
+    Returns the number of strings matched by `pattern`; ambiguity codes match
+    the nucleotides they denote as well as the code itself.
+    """
+    return prod(len(_symbols(s)) for s in pattern)
+
+
+def expand(pattern: str) -> List[str]:
+    """
+    Returns the strings matched by `pattern` (see `expansions`).
+    """
+    return ["".join(p) for p in product(*map(_symbols, pattern))]
+
+
+def states(patterns: Iterable[str]) -> int:
+    """
+    Returns the number of states of the automaton of `patterns` at most,
+    i.e. the total length of their expansions (see `expand`).
+    """
+    return sum(expansions(p) * len(p) for p in patterns)
+
+
+class Automaton:
+    """
+    Aho-Corasick automaton of keyed (degenerate) patterns, compiled into a
+    complete transition table, so each base takes a single lookup.
+    """
+
+    def __init__(self, patterns: Mapping[Hashable, str]) -> None:
+        for pattern in patterns.values():
+            if expansions(pattern) > EXPANSION_LIMIT:
+                raise ValueError(
+                    f"{pattern!r} expands to more than {EXPANSION_LIMIT} strings"
+                )
+
+        if states(patterns.values()) > STATE_LIMIT:
+            raise ValueError(f"patterns may expand to at most {STATE_LIMIT} states")
+
+        goto: List[Dict[str, int]] = [{}]
+        # (key, length) of the patterns ending at each state
+        outputs: List[Tuple[Tuple[Hashable, int], ...]] = [()]
+
+        for key, pattern in patterns.items():
+            for string in expand(pattern):
+                state = 0
+
+                for symbol in string:
+                    if symbol not in goto[state]:
+                        goto[state][symbol] = len(goto)
+                        goto.append({})
+                        outputs.append(())
+
+                    state = goto[state][symbol]
+
+                outputs[state] += ((key, len(pattern)),)
+
+        # breadth-first, each state completed from its failure state (whose
+        # transitions are complete already): the longest proper suffix of its
+        # path that is a path itself
+        self._transitions: List[Dict[str, int]] = [{}] * len(goto)
+        self._transitions[0] = {s: goto[0].get(s, 0) for s in ALPHABET}
+        queue = deque((child, 0) for child in goto[0].values())
+
+        while queue:
+            state, failure = queue.popleft()
+            outputs[state] += outputs[failure]
+            self._transitions[state] = {
+                s: goto[state].get(s, self._transitions[failure][s]) for s in ALPHABET
+            }
+            queue.extend(
+                (child, self._transitions[failure][s])
+                for s, child in goto[state].items()
+            )
+
+        self._outputs = outputs
+
+    def search(self, bases: str) -> Iterator[Tuple[Hashable, int]]:
+        """
+        Yields the (key, offset) of every (possibly overlapping) match of the
+        patterns in `bases`.
+        """
+        transitions, outputs = self._transitions, self._outputs
+        state = 0
+
+        for end, symbol in enumerate(bases.lower()):
+            # symbols outside the alphabet match no pattern
+            state = transitions[state].get(symbol, 0)
+
+            for key, length in outputs[state]:
+                yield key, end + 1 - length
+
+
+def _symbols(symbol: str) -> str:
+    return iupac.symbol_class(symbol).strip("[]")
@@ -0,0 +1,355 @@
+"""
+Restricted regexes over DNA: IUPAC symbols (matching the bases they denote,
+see `iupac.symbol_class`), character classes (`[ACG]`), any base (`.`),
+groups with alternation (`(GAA|GAG)`), bounded repeats (`?`, `{m}`, `{m,n}`)
+and anchors (`^`, `$`). Unbounded repeats and backreferences are rejected, so
+every regex runs in time linear in the bases it scans.
+
+Regexes are compiled into a PostgreSQL regex and a query over the literal
+factors that any match must contain (after Cox, "Regular Expression Matching
+with a Trigram Index"), which shortlists candidates through an index before
+the regex itself is run.
+"""
+from dataclasses import dataclass
+from itertools import product
+from typing import FrozenSet, Optional, Tuple, Union
+
+from app.search import iupac
+
+# largest number of strings tracked as the exact matches of a subexpression;
+# beyond it, they are only kept as a (disjunctive) factor
+EXACT_LIMIT = 16
+
+# largest repeat bound; PostgreSQL caps repeats at 255
+REPEAT_LIMIT = 255
+
+
+class And(frozenset):
+    """
+    Factor query matching bases that contain every one of its factors.
+    """
+
+
+class Or(frozenset):
+    """
+    Factor query matching bases that contain any one of its factors.
+    """
+
+
+# a literal factor, a conjunction or disjunction of factors, or `None`
+# (matching any bases)
+Factors = Union[None, str, And, Or]
+
+
+@dataclass
+class CompiledRegex:
+    regex: str
+    factors: Factors
+
+
+@dataclass
+class _Node:
+    regex: str
+    # every string matched (lowercase), when few
+    exact: Optional[FrozenSet[str]]
+    # factors of any match, besides `exact` and `suffixes`
+    factors: Factors = None
+    # strings any match ends with, when few and not `exact`
+    suffixes: Optional[FrozenSet[str]] = None
+
+    def flushed(self) -> Factors:
+        """
+        Returns the factors of any match, including `exact` (or `suffixes`) as
+        a disjunction.
+        """
+        strings = self.suffixes if self.exact is None else self.exact
+        return _and(self.factors, _or(*strings) if strings else None)
+
+
+def compile(pattern: str) -> CompiledRegex:
+    """
+    Compiles the restricted regex `pattern` (case-insensitive); raises
+    `ValueError` for any syntax outside the restricted set.
+    """
+    parser = _Parser(pattern)
+    node = parser.alternation()
+
+    if parser.position < len(pattern):
+        parser.error("unbalanced ')'")
+
+    return CompiledRegex(regex=node.regex, factors=node.flushed())
+
+
+def simplify(factors: Factors, min_length: int) -> Factors:
+    """
+    Drops the literal factors of `factors` shorter than `min_length`, i.e.
+    too short to be looked up in an index, as matching any bases.
+    """
+    if isinstance(factors, str):
+        return factors if len(factors) >= min_length else None
+
+    if isinstance(factors, And):
+        return _and(*(simplify(f, min_length) for f in factors))
+
+    if isinstance(factors, Or):
+        return _or(*(simplify(f, min_length) for f in factors))
+
+    return None
+
+
+class _Parser:
+    """
+    Recursive descent parser of restricted regexes; each method parses a
+    production starting at `position` into a `_Node`.
+    """
+
+    def __init__(self, pattern: str):
+        self.pattern = pattern.lower()
+        self.position = 0
+
+    def error(self, message: str):
+        raise ValueError(f"{message} at offset {self.position} of the regex")
+
+    def peek(self) -> Optional[str]:
+        if self.position < len(self.pattern):
+            return self.pattern[self.position]
+
+    def take(self) -> str:
+        self.position += 1
+        return self.pattern[self.position - 1]
+
+    def alternation(self) -> _Node:
+        branches = [self.concatenation()]
+
+        while self.peek() == "|":
+            self.take()
+            branches.append(self.concatenation())
+
+        if len(branches) == 1:
+            return branches[0]
+
+        regex = "|".join(b.regex for b in branches)
+
+        if all(b.exact is not None for b in branches):
+            exact = _bounded(frozenset().union(*(b.exact for b in branches)))
+
+            if exact is not None:
+                return _Node(regex=regex, exact=exact)
+
+        return _Node(
+            regex=regex, exact=None, factors=_or(*(b.flushed() for b in branches))
+        )
+
+    def concatenation(self) -> _Node:
+        node = _Node(regex="", exact=frozenset([""]))
+
+        while self.peek() not in (None, "|", ")"):
+            node = _concatenated(node, self.repeat())
+
+        return node
+
+    def repeat(self) -> _Node:
+        node = self.atom()
+
+        if self.peek() in ("*", "+"):
+            self.error("unbounded repeats are not allowed")
+
+        if self.peek() == "?":
+            self.take()
+            return _repeated(node, 0, 1, "?")
+
+        if self.peek() == "{":
+            start = self.position
+            self.take()
+            low = self.number()
+            high = low
+
+            if self.peek() == ",":
+                self.take()
+
+                if self.peek() == "}":
+                    self.error("unbounded repeats are not allowed")
+
+                high = self.number()
+
+            if self.peek() != "}":
+                self.error("expected '}'")
+
+            self.take()
+
+            if high < low or high > REPEAT_LIMIT:
+                self.error(f"repeats are bounded by 0 <= m <= n <= {REPEAT_LIMIT}")
+
+            return _repeated(node, low, high, self.pattern[start : self.position])
+
+        return node
+
+    def number(self) -> int:
+        start = self.position
+
+        while (self.peek() or "").isdigit():
+            self.take()
+
+        if start == self.position:
+            self.error("expected a repeat bound")
+
+        return int(self.pattern[start : self.position])
+
+    def atom(self) -> _Node:
+        symbol = self.peek()
+
+        if symbol is None:
+            self.error("unexpected end")
+
+        self.take()
+
+        if symbol == "(":
+            node = self.alternation()
+
+            if self.peek() != ")":
+                self.error("expected ')'")
+
+            self.take()
+            return _Node(
+                regex=f"(?:{node.regex})",
+                exact=node.exact,
+                factors=node.factors,
+                suffixes=node.suffixes,
+            )
+
+        if symbol == "[":
+            return self.character_class()
+
+        if symbol == ".":
+            return _Node(regex=".", exact=None)
+
+        if symbol in ("^", "$"):
+            return _Node(regex=symbol, exact=frozenset([""]))
+
+        return _symbol(symbol, self)
+
+    def character_class(self) -> _Node:
+        bases = set()
+
+        while self.peek() not in (None, "]"):
+            bases.update(_symbol(self.take(), self).exact)
+
+        if self.peek() != "]":
+            self.error("expected ']'")
+
+        self.take()
+
+        if not bases:
+            self.error("empty character class")
+
+        return _Node(regex=f"[{''.join(sorted(bases))}]", exact=frozenset(bases))
+
+
+def _symbol(symbol: str, parser: _Parser) -> _Node:
+    """
+    Returns the node of IUPAC `symbol`, matching the bases it denotes.
+    """
+    try:
+        regex = iupac.symbol_class(symbol)
+
+    except ValueError:
+        parser.position -= 1
+        parser.error(f"unexpected {symbol!r}")
+
+    return _Node(regex=regex, exact=frozenset(regex.strip("[]")))
+
+
+def _concatenated(left: _Node, right: _Node) -> _Node:
+    regex = left.regex + right.regex
+
+    if right.exact is None:
+        # the strings of the left side are kept as factors
+        return _Node(
+            regex=regex,
+            exact=None,
+            factors=_and(left.flushed(), right.factors),
+            suffixes=right.suffixes,
+        )
+
+    strings = left.suffixes if left.exact is None else left.exact
+
+    if strings is None:
+        return _Node(
+            regex=regex, exact=None, factors=left.factors, suffixes=right.exact
+        )
+
+    joined = _bounded(frozenset(a + b for a, b in product(strings, right.exact)))
+
+    if joined is None:
+        # too many strings: those of the left side are kept as factors
+        return _Node(
+            regex=regex, exact=None, factors=left.flushed(), suffixes=right.exact
+        )
+
+    if left.exact is None:
+        return _Node(regex=regex, exact=None, factors=left.factors, suffixes=joined)
+
+    return _Node(regex=regex, exact=joined)
+
+
+def _repeated(node: _Node, low: int, high: int, quantifier: str) -> _Node:
+    regex = f"(?:{node.regex}){quantifier}"
+
+    if node.exact is None:
+        # at least one occurrence carries the factors of the node
+        return _Node(regex=regex, exact=None, factors=node.flushed() if low else None)
+
+    counts = range(low, high + 1)
+
+    if sum(len(node.exact) ** n for n in counts) <= EXACT_LIMIT:
+        return _Node(
+            regex=regex,
+            exact=frozenset(
+                "".join(strings)
+                for n in counts
+                for strings in product(node.exact, repeat=n)
+            ),
+        )
+
+    # any match starts with `low` occurrences
+    factors = node.flushed() if low else None
+
+    if low and len(node.exact) ** low <= EXACT_LIMIT:
+        factors = _or(
+            *("".join(strings) for strings in product(node.exact, repeat=low))
+        )
+
+    return _Node(regex=regex, exact=None, factors=factors)
+
+
+def _bounded(exact: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    if exact is not None and len(exact) <= EXACT_LIMIT:
+        return exact
+
+
+def _and(*factors: Factors) -> Factors:
+    return _combined(And, factors)
+
+
+def _or(*factors: Factors) -> Factors:
+    # any operand matching any bases makes the disjunction match any bases
+    if None in factors or "" in factors:
+        return None
+
+    return _combined(Or, factors)
+
+
+def _combined(kind: type, factors: Tuple[Factors, ...]) -> Factors:
+    operands = set()
+
+    for f in factors:
+        if isinstance(f, kind):
+            operands.update(f)
+
+        elif f not in (None, ""):
+            operands.add(f)
+
+    if len(operands) == 1:
+        return operands.pop()
+
+    return kind(operands) if operands else None
@@ -0,0 +1,249 @@
+"""
+Bounded cache of serialized values, each stored along with the generation
+of the data it was computed from: an entry is only hit at that generation,
+so it is invalidated exactly when its data changes. Entries are evicted in
+least recently used order once their total size exceeds `cache_size` bytes.
+
+The cache is local to the process by default; setting `cache_backend` to
+`postgres` shares it across API processes and workers through an unlogged
+table instead, queried through the database service of the caller (e.g.
+`AsyncDBService` on the event loop).
+"""
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import Table, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.services.db import DBService
+from app.utils import singleton
+
+cache: Table = DBService.cache
+
+
+class LocalStore:
+    """
+    In-process LRU store of (generation, value) entries, bounded by the total
+    size of their values; the database service of each call is unused.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.evictions = 0
+        self._entries: OrderedDict[str, Tuple[str, bytes]] = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, db: DBService, key: str) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+            return entry
+
+    def put(self, db: DBService, key: str, generation: str, value: bytes):
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key)[1])
+
+            self._entries[key] = (generation, value)
+            self._size += len(value)
+
+            while self._size > self.capacity:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def usage(self, db: DBService) -> Tuple[int, int]:
+        """
+        Returns the number of entries and their total size.
+        """
+        with self._lock:
+            return len(self._entries), self._size
+
+
+class PostgresStore:
+    """
+    LRU store of (generation, value) entries in the (unlogged) `cache` table,
+    shared by every process of the service; queried through the database
+    service `db` of each call, so never blocks the event loop when called
+    through `AsyncDBService`.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.evictions = 0
+
+    def get(self, db: DBService, key: str) -> Optional[Tuple[str, bytes]]:
+        # reads renew the entry, i.e. its recency
+        return db.execute(
+            cache.update()
+            .where(cache.c.key == key)
+            .values(accessed_at=func.clock_timestamp())
+            .returning(cache.c.generation, cache.c.value)
+        ).one_or_none()
+
+    def put(self, db: DBService, key: str, generation: str, value: bytes):
+        statement = insert(cache).values(key=key, generation=generation, value=value)
+
+        with db.transaction() as connection:
+            connection.execute(
+                statement.on_conflict_do_update(
+                    index_elements=[cache.c.key],
+                    set_={
+                        "generation": statement.excluded.generation,
+                        "value": statement.excluded.value,
+                        "accessed_at": func.clock_timestamp(),
+                    },
+                )
+            )
+
+            # least recently used entries beyond capacity
+            total = select(
+                cache.c.key,
+                func.sum(func.octet_length(cache.c.value))
+                .over(order_by=cache.c.accessed_at.desc())
+                .label("total"),
+            ).subquery()
+            self.evictions += connection.execute(
+                delete(cache).where(
+                    cache.c.key.in_(
+                        select(total.c.key).where(total.c.total > self.capacity)
+                    )
+                )
+            ).rowcount
+
+    def usage(self, db: DBService) -> Tuple[int, int]:
+        """
+        Returns the number of entries and their total size.
+        """
+        return tuple(
+            db.execute(
+                select(
+                    func.count(),
+                    func.coalesce(func.sum(func.octet_length(cache.c.value)), 0),
+                )
+            ).one()
+        )
+
+
+@singleton
+class CacheService:
+    """
+    Singleton cache of serialized values with hit/miss metrics; `stale` counts
+    entries missed because their data changed since they were cached.
+    """
+
+    def __init__(self, db: DBService = DBService()) -> None:
+        # the singleton is initialized on every instantiation; its store once
+        if hasattr(self, "_store"):
+            return
+
+        config = db.config
+        self.hits = self.misses = self.stale = 0
+
+        if config.cache_backend == "postgres":
+            self._store = PostgresStore(config.cache_size)
+
+        else:
+            self._store = LocalStore(config.cache_size)
+
+    @property
+    def capacity(self) -> int:
+        return self._store.capacity
+
+    def get(self, key: str, generation: str, db: DBService) -> Optional[bytes]:
+        """
+        Returns the value cached at `key` for `generation`, if any; the store
+        is queried through `db`, i.e. that of the caller.
+        """
+        entry = self._store.get(db, key)
+
+        if entry is not None and entry[0] == generation:
+            self.hits += 1
+            return entry[1]
+
+        if entry is not None:
+            self.stale += 1
+
+        self.misses += 1
+
+    def put(self, key: str, generation: str, value: bytes, db: DBService):
+        """
+        Caches `value` at `key` for `generation`, unless it exceeds capacity.
+        """
+        if len(value) <= self.capacity:
+            self._store.put(db, key, generation, value)
+
+    def stats(self, db: DBService) -> Dict[str, int]:
+        entries, size = self._store.usage(db)
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self._store.evictions,
+            "entries": entries,
+            "size": size,
+            "capacity": self.capacity,
+        }
+
+
+@singleton
+class UserIdCache:
+    """
+    Singleton in-process cache of user IDs by Benchling ID, evicting least
+    recently used entries beyond `user_cache_size` entries. Users are never
+    deleted nor re-keyed, so entries never go stale.
+    """
+
+    def __init__(self, db: DBService = DBService()) -> None:
+        # the singleton is initialized on every instantiation; its entries once
+        if hasattr(self, "_ids"):
+            return
+
+        self.capacity = db.config.user_cache_size
+        self.hits = self.misses = 0
+        self._ids: OrderedDict[str, int] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, benchling_ids: Iterable[str]) -> Dict[str, int]:
+        """
+        Returns the cached IDs of the users of `benchling_ids`, if any.
+        """
+        ids = {}
+
+        with self._lock:
+            for benchling_id in benchling_ids:
+                id = self._ids.get(benchling_id)
+
+                if id is None:
+                    self.misses += 1
+                    continue
+
+                self._ids.move_to_end(benchling_id)
+                ids[benchling_id] = id
+                self.hits += 1
+
+        return ids
+
+    def put(self, ids: Dict[str, int]):
+        with self._lock:
+            for benchling_id, id in ids.items():
+                self._ids[benchling_id] = id
+                self._ids.move_to_end(benchling_id)
+
+            while len(self._ids) > self.capacity:
+                self._ids.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._ids),
+                "capacity": self.capacity,
+            }
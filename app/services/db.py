@@ -1,35 +1,296 @@
-from contextlib import AbstractContextManager
-from itertools import repeat
-from typing import Optional
+import asyncio
+import heapq
+import logging
+import sys
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import AbstractContextManager, ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from itertools import islice, product, repeat
+from threading import BoundedSemaphore
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+from weakref import WeakKeyDictionary
 
 from sqlalchemy import (
+    DDL,
+    BigInteger,
     Column,
+    Connection,
     DateTime,
+    Engine,
     Enum,
     ForeignKey,
     Identity,
     Index,
     Integer,
+    LargeBinary,
     MetaData,
+    PrimaryKeyConstraint,
+    Row,
+    Select,
     String,
     Table,
+    TableClause,
+    Text,
+    and_,
+    column,
     create_engine,
+    event,
+    delete,
+    func,
     insert,
+    inspect,
+    or_,
     select,
+    table,
     text,
     update,
 )
+from psycopg import AsyncConnection
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.schema import AddConstraint, CreateColumn
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.util import await_only, greenlet_spawn
+from starlette.concurrency import run_in_threadpool
 from app.config import Config
+from app.services import metrics
 from app.models.dna import Status
+from app.services.packing import (
+    EXCEPTIONS,
+    HEX_DIGITS,
+    SYMBOLS_2BIT,
+    SYMBOLS_4BIT,
+    UPPERCASE,
+)
 
 from app.utils import singleton
 
+# hex digits of 2-bit packed bases, distinct from any nucleotide symbol
+HEX_PLACEHOLDERS = "GHIJKLMNOPQRSTUV"
+
+# length of the k-mer prefixes the k-mer index is keyed by (see `app.search.kmer`)
+KMER_BUCKET_K = 10
+
+
+class UnitOfWork:
+    """
+    Connection and transaction shared by the statements of a request or task,
+    checked out on first use.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.active = True
+        self._engine = engine
+        self._connection: Optional[Connection] = None
+        self._stack = ExitStack()
+        self._on_commit: List[Callable[[], Any]] = []
+
+    @property
+    def connection(self) -> Connection:
+        if self._connection is None:
+            self._connection = self._stack.enter_context(_connect(self._engine))
+            self._stack.enter_context(self._connection.begin())
+
+        return self._connection
+
+    def __enter__(self) -> "UnitOfWork":
+        return self
+
+    def __exit__(self, *exc_info) -> Optional[bool]:
+        # commits, or rolls back on error, and returns the connection
+        self.active = False
+        suppressed = self._stack.__exit__(*exc_info)
+
+        if exc_info[0] is None:
+            for callback in self._on_commit:
+                callback()
+
+        return suppressed
+
+    def on_commit(self, callback: Callable[[], Any]):
+        self._on_commit.append(callback)
+
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# statements are logged up to this length; parameters (e.g. bases) never are
+SLOW_QUERY_LOG_LENGTH = 1000
+
+# functions of this module executing statements on behalf of their caller
+_PLUMBING = {"execute", "stream", "transaction", "connection", "start", "end"}
+
+
+def _connect(engine: Engine) -> Connection:
+    """
+    Checks out a connection of `engine`, timing the wait for it.
+    """
+    with metrics.db_pool_checkout_duration.time(
+        engine="async" if engine.dialect.is_async else "sync"
+    ):
+        return engine.connect()
+
+
+def _instrument(engine: Engine, config: Config):
+    """
+    Times the statements of `engine` and counts their rows, by caller (see
+    `_caller`); statements slower than `slow_query_seconds` are logged.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start(connection, cursor, statement, parameters, context, executemany):
+        context.started_at = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def end(connection, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context.started_at
+        # statements fetched concurrently (see `DBService.fan_out`) are
+        # attributed to the caller of the fan-out
+        caller = context.execution_options.get("caller") or _caller()
+        verb = statement.lstrip().split(None, 1)[0].lower()
+        metrics.db_statement_duration.observe(duration, caller=caller, verb=verb)
+
+        # unknown (-1) for server-side cursors, until fetched
+        if cursor.rowcount >= 0:
+            metrics.db_statement_rows.inc(cursor.rowcount, caller=caller, verb=verb)
+
+        if 0 < config.slow_query_seconds <= duration:
+            logger.warning(
+                "slow statement (%.3fs) from %s: %s",
+                duration,
+                caller,
+                statement[:SLOW_QUERY_LOG_LENGTH],
+            )
+
+
+def _caller() -> str:
+    """
+    Returns the function of the service that executes the current statement,
+    e.g. `app.collections.dna.DNASequenceCollection._search`, skipping the
+    plumbing of this module.
+    """
+    frame = sys._getframe(2)
+
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+
+        if module.startswith("app.") and not (
+            module == __name__ and frame.f_code.co_name in _PLUMBING
+        ):
+            # qualified names (e.g. of methods) as of Python 3.11
+            code = frame.f_code
+            return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+        frame = frame.f_back
+
+    return "unknown"
+
+
+def _url(config: Config) -> str:
+    return f"postgresql+psycopg://{config.db_username}:{config.db_password}@{config.db_host}:{config.db_port}/dna"
+
+
+async def _copy_async(
+    connection: AsyncConnection, statement: str, rows: Iterable[tuple]
+) -> int:
+    count = 0
+
+    async with connection.cursor() as cursor:
+        async with cursor.copy(statement) as copy:
+            for count, row in enumerate(rows, 1):
+                await copy.write_row(row)
+
+    return count
+
+
+def _fetch(rows: Iterator[T], size: int) -> List[T]:
+    return list(islice(rows, size))
+
+
+def _fan_outs(config: Config) -> int:
+    """
+    Returns the number of fan-outs (see `DBService.fan_out`), each holding a
+    connection per partition, that may run at once without exhausting the
+    pool between them; partitions must fit the pool.
+    """
+    capacity = config.db_pool_size + config.db_max_overflow
+
+    if config.partitions > capacity:
+        raise ValueError(
+            f"{config.partitions} partitions exceed the {capacity} connections "
+            "of the pool (DB_POOL_SIZE + DB_MAX_OVERFLOW)"
+        )
+
+    return capacity // max(config.partitions, 1)
+
+
+def _partitioned(metadata: MetaData, partitions: int) -> MetaData:
+    """
+    Copies the schema of `metadata`, with the tables declaring a
+    `partition_by` column (in their `info`) hash partitioned on it into
+    `partitions` partitions, each with its own indexes. Primary keys of
+    partitioned tables include their partition key, so references to these
+    tables, no longer unique by ID alone, are not enforced.
+    """
+    copy = MetaData()
+
+    for t in metadata.sorted_tables:
+        t.to_metadata(copy)
+
+    partitioned = [t for t in copy.sorted_tables if "partition_by" in t.info]
+
+    for t in copy.sorted_tables:
+        for constraint in list(t.foreign_key_constraints):
+            if constraint.referred_table in partitioned:
+                t.constraints.discard(constraint)
+
+    for t in partitioned:
+        key = t.c[t.info["partition_by"]]
+
+        if not key.primary_key:
+            key.primary_key = True
+            t.append_constraint(PrimaryKeyConstraint(*t.primary_key, key))
+
+        t.dialect_kwargs["postgresql_partition_by"] = f"HASH ({key.name})"
+
+        for remainder in range(partitions):
+            event.listen(
+                t,
+                "after_create",
+                DDL(
+                    f"CREATE TABLE {DBService.partition(t, remainder).name} "
+                    f"PARTITION OF {t.name} "
+                    f"FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})"
+                ),
+            )
+
+    return copy
+
+
+# unit of work of the current request or task, if any
+_unit_of_work: ContextVar[Optional[UnitOfWork]] = ContextVar(
+    "unit_of_work", default=None
+)
+
 
 @singleton
 class DBService(AbstractContextManager):
     """
     Singleton class encapsulating a database connection.
     """
+
     _metadata: MetaData = MetaData()
 
     # data definition language (DDL)
@@ -43,8 +304,18 @@ class DBService(AbstractContextManager):
         Column("name", String(70)),
         Column("created_at", DateTime),
         Column("bases", String(collation="C")),
+        Column("bases_packed", LargeBinary),
+        Column("bases_sha256", LargeBinary),
+        # sequence storing the (identical) bases, when stored once
+        Column("bases_id", Integer, ForeignKey("dna_sequence.id")),
+        # hash partition key, given `partitions`; unique, unlike IDs once
+        # partitioned, so new sequences are still told apart by it
+        info={"partition_by": "benchling_id"},
     )
 
+    # owner of the bases of a DNA sequence storing them by reference
+    dna_sequence_owner = dna_sequence.alias("owner")
+
     # User definition
     user: Table = Table(
         "user",
@@ -61,6 +332,20 @@ class DBService(AbstractContextManager):
         _metadata,
         Column("id", Integer, Identity(), primary_key=True),
         Column("status", Enum(Status), default=Status.INITIATED),
+        Column("processed", Integer, server_default="0"),
+        Column("inserted", Integer, server_default="0"),
+        Column("skipped_duplicates", Integer, server_default="0"),
+        Column("failed", Integer, server_default="0"),
+        Column("claimed_at", DateTime(timezone=True)),
+    )
+
+    # Batch item definition; uploaded sequences (as JSON) pending processing
+    batch_item: Table = Table(
+        "batch_item",
+        _metadata,
+        Column("batch_id", Integer, ForeignKey("batch.id"), primary_key=True),
+        Column("n", Integer, primary_key=True),
+        Column("item", Text),
     )
 
     # DNA <-> Batch mapping definition (many-to-many)
@@ -71,6 +356,77 @@ class DBService(AbstractContextManager):
         Column("dna_sequence_id", Integer, ForeignKey("dna_sequence.id")),
     )
 
+    # DNA sequence chunk definition; fixed-size chunks of bases for random access
+    dna_sequence_chunk: Table = Table(
+        "dna_sequence_chunk",
+        _metadata,
+        Column(
+            "dna_sequence_id", Integer, ForeignKey("dna_sequence.id"), primary_key=True
+        ),
+        Column("chunk", Integer, primary_key=True),
+        Column("bases", String(collation="C")),
+    )
+
+    # k-mer inverted index definition; distinct unambiguous k-mers per sequence,
+    # encoded 2 bits per nucleotide and split into blocks (see `app.search.kmer`)
+    dna_kmer: Table = Table(
+        "dna_kmer",
+        _metadata,
+        Column(
+            "dna_sequence_id", Integer, ForeignKey("dna_sequence.id"), primary_key=True
+        ),
+        Column("block", Integer, primary_key=True),
+        # k-mer size indexed with, so k-mers are indexed again once it changes
+        Column("k", Integer),
+        Column("kmers", ARRAY(Integer)),
+        info={"partition_by": "dna_sequence_id"},
+    )
+
+    # generation of stored DNA sequences (see `app.services.cache`); a single
+    # row, bumped in every transaction adding sequences
+    dna_generation: Table = Table(
+        "dna_generation",
+        _metadata,
+        Column("id", Integer, primary_key=True),
+        Column("generation", BigInteger),
+    )
+
+    # shared cache (see `app.services.cache`); unlogged, i.e. neither written
+    # ahead nor crash-safe
+    cache: Table = Table(
+        "cache",
+        _metadata,
+        Column("key", String, primary_key=True),
+        Column("generation", String),
+        Column("value", LargeBinary),
+        Column(
+            "accessed_at",
+            DateTime(timezone=True),
+            server_default=func.clock_timestamp(),
+            index=True,
+        ),
+        prefixes=["UNLOGGED"],
+    )
+
+    # staging table of DNA sequences ingested through `COPY`; temporary, i.e.
+    # created per ingestion transaction and dropped on commit
+    _staging_metadata: MetaData = MetaData()
+
+    dna_sequence_staging: Table = Table(
+        "dna_sequence_staging",
+        _staging_metadata,
+        Column("n", Integer, primary_key=True),
+        Column("benchling_id", String(16)),
+        Column("creator_id", Integer),
+        Column("name", String(70)),
+        Column("created_at", DateTime),
+        Column("bases", String(collation="C")),
+        Column("bases_packed", LargeBinary),
+        Column("bases_sha256", LargeBinary),
+        prefixes=["TEMPORARY"],
+        postgresql_on_commit="DROP",
+    )
+
     # Trigram index on DNA sequences bases; optimized infix pattern matching
     dna_sequence_bases_trgm: Index = Index(
         "dna_sequence_bases_trgm",
@@ -81,11 +437,76 @@ class DBService(AbstractContextManager):
         },
     )
 
+    # bases of a DNA sequence, whether stored as text or packed
+    dna_sequence_bases = func.coalesce(
+        dna_sequence.c.bases,
+        func.dna_unpack(dna_sequence.c.bases_packed),
+        select(
+            func.coalesce(
+                dna_sequence_owner.c.bases,
+                func.dna_unpack(dna_sequence_owner.c.bases_packed),
+            )
+        )
+        .where(dna_sequence_owner.c.id == dna_sequence.c.bases_id)
+        .correlate(dna_sequence)
+        .scalar_subquery(),
+    )
+
+    # bases of a DNA sequence decoded once per row (joined laterally) for
+    # expressions referencing them repeatedly; `OFFSET 0` keeps the planner
+    # from inlining, i.e. re-evaluating, the decoding per reference
+    dna_sequence_unpacked = (
+        select(dna_sequence_bases.label("bases"))
+        .correlate(dna_sequence)
+        .offset(0)
+        .lateral("unpacked")
+    )
+
+    # Trigram index on packed DNA sequence bases
+    dna_sequence_bases_packed_trgm: Index = Index(
+        "dna_sequence_bases_packed_trgm",
+        func.dna_unpack(dna_sequence.c.bases_packed).label("bases_unpacked"),
+        postgresql_using="gin",
+        postgresql_ops={
+            "bases_unpacked": "gin_trgm_ops",
+        },
+    )
+
+    # Content hash index on DNA sequences; exact lookup of bases
+    dna_sequence_bases_sha256: Index = Index(
+        "dna_sequence_bases_sha256", dna_sequence.c.bases_sha256
+    )
+
+    # Index on references to stored bases
+    dna_sequence_bases_id: Index = Index(
+        "dna_sequence_bases_id", dna_sequence.c.bases_id
+    )
+
+    # GIN index on k-mer buckets (see `add_dna_kmer_buckets`); posting lists of
+    # sequences intersected by `@>`
+    dna_kmer_buckets_gin: Index = Index(
+        "dna_kmer_buckets_gin",
+        func.dna_kmer_buckets(dna_kmer.c.kmers, dna_kmer.c.k),
+        postgresql_using="gin",
+    )
+
     def __init__(self, config=Config()) -> None:
+        # the singleton is initialized on every instantiation; its engine once
+        if hasattr(self, "_engine"):
+            return
+
+        self.config = config
         self._engine = create_engine(
-            f"postgresql+psycopg://{config.db_username}:{config.db_password}@{config.db_host}:{config.db_port}/dna",
-            pool_size=5,
+            _url(config),
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
         )
+        _instrument(self._engine, config)
+        # fetches rows of concurrent streams (see `fan_out`)
+        self._executor = ThreadPoolExecutor(
+            max_workers=config.db_pool_size + config.db_max_overflow
+        )
+        self._fan_outs = BoundedSemaphore(_fan_outs(config))
 
     def __enter__(self) -> "DBService":
         return self
@@ -94,45 +515,615 @@ class DBService(AbstractContextManager):
         return self.exit()
 
     def execute(self, statement, *args, **kwargs):
-        with self._engine.connect() as connection, connection.begin():
+        """
+        Executes `statement` in the current unit of work, if any; else in a
+        transaction of its own.
+        """
+        unit = _unit_of_work.get()
+
+        if unit is not None and unit.active:
+            return unit.connection.execute(statement, *args, **kwargs)
+
+        with _connect(self._engine) as connection, connection.begin():
             return connection.execute(statement, *args, **kwargs)
 
+    def stream(
+        self, statement, *args, timeout: Optional[float] = None, **kwargs
+    ) -> Iterator[Row]:
+        """
+        Executes `statement` through a server-side cursor, fetching rows in
+        batches of `yield_per`; the connection stays checked out until the
+        rows are exhausted (or the stream is closed). Each fetch is cancelled
+        after `timeout` seconds, if given. Streams outlive the request that
+        starts them, so never run in its unit of work.
+        """
+        with _connect(self._engine) as connection, connection.begin():
+            if timeout is not None:
+                connection.execute(
+                    select(
+                        func.set_config(
+                            "statement_timeout", str(int(timeout * 1000)), True
+                        )
+                    )
+                )
+
+            with connection.execution_options(yield_per=self.config.yield_per).execute(
+                statement, *args, **kwargs
+            ) as result:
+                yield from result
+
+    def fan_out(
+        self, statements: List[Select], key: Callable[[Row], Any]
+    ) -> Iterator[Row]:
+        """
+        Streams `statements` (each ordered by `key`) concurrently, each on a
+        connection of its own, merging their rows in `key` order; every
+        stream fetches its next `yield_per` rows while its current ones are
+        merged. Like streams, never run in the current unit of work. Fan-outs
+        beyond those the pool can serve at once wait for a running one to end.
+        """
+        caller = _caller()
+        size = self.config.yield_per
+        self._acquire()
+        streams = [self.stream(s.execution_options(caller=caller)) for s in statements]
+        # the first rows of every stream are needed to merge any
+        pending = [self._spawn(_fetch, stream, size) for stream in streams]
+
+        def rows(i: int) -> Iterator[Row]:
+            while True:
+                self._wait([pending[i]])
+                batch = pending[i].result()
+
+                if not batch:
+                    return
+
+                pending[i] = self._spawn(_fetch, streams[i], size)
+                yield from batch
+
+        try:
+            yield from heapq.merge(*map(rows, range(len(streams))), key=key)
+
+        finally:
+            self._wait(pending)
+
+            for stream in streams:
+                stream.close()
+
+            self._release()
+
+    @staticmethod
+    def partition(t: Table, remainder: int) -> TableClause:
+        """
+        Returns the hash partition `remainder` of table `t` (see
+        `partitions`), e.g. for statements over that partition alone.
+        """
+        return table(f"{t.name}_p{remainder}", *(column(c.name, c.type) for c in t.c))
+
+    def offload(self, function: Callable[..., T], *args) -> T:
+        """
+        Runs CPU-bound `function`, which executes no statements (e.g. parsing
+        or scanning large bases); see `AsyncDBService.offload`.
+        """
+        return function(*args)
+
+    def _spawn(self, function: Callable[..., T], *args) -> Future:
+        return self._executor.submit(function, *args)
+
+    def _wait(self, futures: List[Future]):
+        wait(futures)
+
+    def _acquire(self):
+        self._fan_outs.acquire()
+
+    def _release(self):
+        self._fan_outs.release()
+
+    @contextmanager
+    def unit_of_work(self) -> Iterator[UnitOfWork]:
+        """
+        Binds a unit of work to the current context (request or task), so the
+        statements executed within it, across collections, share a single
+        connection and transaction, committed on exit; nested units join the
+        enclosing one.
+        """
+        unit = _unit_of_work.get()
+
+        if unit is not None and unit.active:
+            yield unit
+            return
+
+        with UnitOfWork(self._engine) as unit:
+            token = _unit_of_work.set(unit)
+
+            try:
+                yield unit
+
+            finally:
+                _unit_of_work.reset(token)
+
+    def on_commit(self, callback: Callable[[], Any]):
+        """
+        Calls `callback` once the current unit of work commits, if any (never
+        if it rolls back); else at once, as statements executed outside of
+        one are committed on execution.
+        """
+        unit = _unit_of_work.get()
+
+        if unit is not None and unit.active:
+            unit.on_commit(callback)
+
+        else:
+            callback()
+
+    @contextmanager
+    def transaction(self) -> Iterator[Connection]:
+        """
+        Yields a connection whose statements, as well as those executed
+        through `execute` meanwhile, run in a single transaction; that of the
+        current unit of work, if any.
+        """
+        with self.unit_of_work() as unit:
+            yield unit.connection
+
+    def copy(self, connection: Connection, table: Table, rows: Iterable[tuple]) -> int:
+        """
+        Streams `rows` into `table` through `COPY ... FROM STDIN` on
+        `connection`, returning the number of rows copied.
+        """
+        columns = ", ".join(c.name for c in table.c)
+        statement = f"COPY {table.name} ({columns}) FROM STDIN"
+        driver_connection = connection.connection.driver_connection
+
+        if isinstance(driver_connection, AsyncConnection):
+            # connection of the async engine, run from a greenlet
+            return await_only(_copy_async(driver_connection, statement, rows))
+
+        count = 0
+
+        with driver_connection.cursor() as cursor:
+            with cursor.copy(statement) as copy:
+                for count, row in enumerate(rows, 1):
+                    copy.write_row(row)
+
+        return count
+
     def create_all(self):
-        return self._metadata.create_all(self._engine)
+        return self._schema().create_all(self._engine)
 
     def drop_all(self):
-        return self._metadata.drop_all(self._engine)
+        return self._schema().drop_all(self._engine)
+
+    def add_columns(self):
+        """
+        Adds the columns (with their references and indexes) defined since
+        existing tables were created, as `create_all` skips existing tables.
+        """
+        with self.transaction() as connection:
+            inspector = inspect(connection)
+            preparer = connection.dialect.identifier_preparer
+
+            for t in self._schema().sorted_tables:
+                if not inspector.has_table(t.name):
+                    continue
+
+                existing = {c["name"] for c in inspector.get_columns(t.name)}
+                added = [c for c in t.columns if c.name not in existing]
+
+                for c in added:
+                    spec = CreateColumn(c).compile(dialect=connection.dialect)
+                    connection.execute(
+                        text(
+                            f"ALTER TABLE {preparer.format_table(t)} "
+                            f"ADD COLUMN IF NOT EXISTS {spec}"
+                        )
+                    )
+
+                for constraint in t.foreign_key_constraints:
+                    if set(constraint.columns).intersection(added):
+                        connection.execute(AddConstraint(constraint))
+
+                for index in t.indexes:
+                    index.create(connection, checkfirst=True)
+
+    def _schema(self) -> MetaData:
+        if self.config.partitions:
+            return _partitioned(self._metadata, self.config.partitions)
+
+        return self._metadata
 
-    def init_batch(self) -> int:
+    def init_batch(self, items: Iterable[str]) -> int:
+        """
+        Creates a batch and spools its `items` (serialized sequences) through
+        `COPY`, in a single transaction so it is only queued once complete.
+        """
         batch = self.batch
-        return self.execute(insert(batch).returning(batch.c.id)).scalar()
 
-    def get_batch_status(self, id: int) -> Optional[Status]:
+        with self.transaction() as connection:
+            id = connection.execute(insert(batch).returning(batch.c.id)).scalar()
+            self.copy(
+                connection,
+                self.batch_item,
+                ((id, n, item) for n, item in enumerate(items)),
+            )
+
+            return id
+
+    def claim_batch(self) -> Optional[int]:
+        """
+        Claims the next queued batch, or a batch whose worker stopped renewing
+        its `batch_lease` (seconds); batches claimed concurrently are skipped.
+        """
+        batch = self.batch
+        # the clock, unlike `now()`, is not frozen at the transaction start
+        expired = func.clock_timestamp() - timedelta(seconds=self.config.batch_lease)
+        claimable = (
+            select(batch.c.id)
+            .where(
+                or_(
+                    batch.c.status == Status.INITIATED,
+                    and_(
+                        batch.c.status == Status.PROCESSING,
+                        batch.c.claimed_at < expired,
+                    ),
+                )
+            )
+            .order_by(batch.c.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+
+        return self.execute(
+            update(batch)
+            .where(batch.c.id == claimable)
+            .values(status=Status.PROCESSING, claimed_at=func.clock_timestamp())
+            .returning(batch.c.id)
+        ).scalar_one_or_none()
+
+    def lock_batch(self, id: int) -> bool:
+        """
+        Renews the lease of claimed batch `id` and locks it until the current
+        unit of work ends, so it is never claimed again while a chunk is
+        processed; false if it is no longer processing.
+        """
+        batch = self.batch
+        locked = self.execute(
+            update(batch)
+            .where(batch.c.id == id, batch.c.status == Status.PROCESSING)
+            .values(claimed_at=func.clock_timestamp())
+            .returning(batch.c.id)
+        ).scalar_one_or_none()
+
+        return locked is not None
+
+    def requeue_batch(self, id: int) -> Optional[int]:
+        """
+        Queues failed batch `id` again, to resume from its last committed chunk.
+        """
         batch = self.batch
         return self.execute(
-            select(batch.c.status).where(batch.c.id == id)
+            update(batch)
+            .where(batch.c.id == id, batch.c.status == Status.FAILED)
+            .values(status=Status.INITIATED)
+            .returning(batch.c.id)
         ).scalar_one_or_none()
 
-    def update_batch(self, id: int, dna_ids: list[int]):
+    def get_batch_status(self, id: int) -> Optional[Row]:
         batch = self.batch
+        return self.execute(
+            select(
+                batch.c.status,
+                batch.c.processed,
+                batch.c.inserted,
+                batch.c.skipped_duplicates,
+                batch.c.failed,
+            ).where(batch.c.id == id)
+        ).one_or_none()
+
+    def get_batch_totals(self) -> List[Row]:
+        """
+        Returns the number of batches, and the sum of their progress counts,
+        by status.
+        """
+        batch = self.batch
+        return self.execute(
+            select(
+                batch.c.status,
+                func.count().label("batches"),
+                *(
+                    func.coalesce(func.sum(c), 0).label(c.name)
+                    for c in (
+                        batch.c.processed,
+                        batch.c.inserted,
+                        batch.c.skipped_duplicates,
+                        batch.c.failed,
+                    )
+                ),
+            ).group_by(batch.c.status)
+        ).all()
+
+    def pool_status(self) -> Dict[str, int]:
+        """
+        Returns the number of connections of the pool checked out, and idle.
+        """
+        pool = self._engine.pool
+        return {"checked_out": pool.checkedout(), "idle": pool.checkedin()}
+
+    def set_batch_status(self, id: int, status: Status):
+        batch = self.batch
+        self.execute(update(batch).where(batch.c.id == id).values(status=status))
+
+    def get_batch_items(self, id: int, limit: int) -> List[Row]:
+        """
+        Returns the next `limit` pending items of batch `id`.
+        """
+        batch_item = self.batch_item
+        return self.execute(
+            select(batch_item.c.n, batch_item.c.item)
+            .where(batch_item.c.batch_id == id)
+            .order_by(batch_item.c.n)
+            .limit(limit)
+        ).all()
+
+    def update_batch(
+        self,
+        connection: Connection,
+        id: int,
+        dna_ids: List[int],
+        through: int,
+        processed: int,
+        failed: int,
+    ):
+        """
+        Records a processed chunk of batch `id` on `connection`, i.e. within
+        the transaction ingesting it: maps the batch to its inserted
+        sequences, adds to its counters, drops its items up to `through` and
+        renews its lease.
+        """
+        batch = self.batch
+        batch_item = self.batch_item
         dna_batch = self.dna_batch
 
-        try:
-            # map batch to sequences
-            self.execute(insert(dna_batch).values(list(zip(repeat(id), dna_ids))))
+        # map batch to sequences
+        if dna_ids:
+            connection.execute(insert(dna_batch).values(list(zip(repeat(id), dna_ids))))
 
-        except Exception as e:
-            self.execute(
-                update(batch).where(batch.c.id == id).values(status=Status.FAILED)
+        connection.execute(
+            update(batch)
+            .where(batch.c.id == id)
+            .values(
+                processed=batch.c.processed + processed,
+                inserted=batch.c.inserted + len(dna_ids),
+                skipped_duplicates=batch.c.skipped_duplicates
+                + (processed - failed - len(dna_ids)),
+                failed=batch.c.failed + failed,
+                claimed_at=func.clock_timestamp(),
+            )
+        )
+        connection.execute(
+            delete(batch_item).where(
+                batch_item.c.batch_id == id, batch_item.c.n <= through
             )
-
-        # update batch status
-        self.execute(
-            update(batch).where(batch.c.id == id).values(status=Status.COMPLETED)
         )
 
     def add_pg_trgm(self):
         self.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
+    def add_dna_unpack(self):
+        """
+        Adds `dna_unpack(packed)`, decoding packed bases (see
+        `app.services.packing`) server-side; must precede creation of the
+        packed bases index. 2-bit payloads are hex encoded into placeholder
+        digits, each of which is then replaced by its pair of bases; exception
+        runs are then applied in order, collecting the parts of the bases.
+        """
+        pairs = "encode(payload, 'hex')"
+        pairs = f"translate({pairs}, '{HEX_DIGITS}', '{HEX_PLACEHOLDERS}')"
+
+        for placeholder, pair in zip(HEX_PLACEHOLDERS, product(SYMBOLS_2BIT, repeat=2)):
+            pairs = f"replace({pairs}, '{placeholder}', '{''.join(pair)}')"
+
+        # (big-endian) unsigned 32-bit integer at byte {0} of `packed`
+        uint32 = " | ".join(
+            f"(get_byte(packed, {{0}} + {byte}) << {24 - 8 * byte})"
+            for byte in range(4)
+        )
+
+        self.execute(
+            text(
+                f"""
+                CREATE OR REPLACE FUNCTION dna_unpack(packed bytea)
+                RETURNS text AS $$
+                DECLARE
+                    encoding integer = get_byte(packed, 0);
+                    runs integer = 0;
+                    run integer;
+                    payload bytea;
+                    bases text;
+                    raw bytea;
+                    parts bytea[] = '{{}}';
+                    run_end integer = 0;
+                    run_offset integer;
+                    run_length integer;
+                    run_symbol integer;
+                BEGIN
+                    IF encoding & {EXCEPTIONS} <> 0 THEN
+                        runs = {uint32.format(2)};
+                        payload = substr(packed, 7 + 9 * runs);
+                    ELSE
+                        payload = substr(packed, 3);
+                    END IF;
+
+                    bases = CASE encoding & ~{EXCEPTIONS}
+                        WHEN 2 THEN {pairs}
+                        ELSE translate(
+                            encode(payload, 'hex'), '{HEX_DIGITS}', '{SYMBOLS_4BIT}'
+                        )
+                    END;
+                    bases = substr(bases, 1, length(bases) - get_byte(packed, 1));
+
+                    IF runs = 0 THEN
+                        RETURN bases;
+                    END IF;
+
+                    -- sliced as bytes, as slicing text counts characters
+                    raw = convert_to(bases, 'UTF8');
+
+                    FOR run IN 0 .. runs - 1 LOOP
+                        run_offset = {uint32.format("6 + 9 * run")};
+                        run_length = {uint32.format("10 + 9 * run")};
+                        run_symbol = get_byte(packed, 14 + 9 * run);
+                        parts = array_append(
+                            parts,
+                            substr(raw, run_end + 1, run_offset - run_end)
+                        );
+                        parts = array_append(parts, CASE run_symbol
+                            WHEN {UPPERCASE} THEN convert_to(
+                                upper(
+                                    convert_from(
+                                        substr(raw, run_offset + 1, run_length), 'UTF8'
+                                    )
+                                ),
+                                'UTF8'
+                            )
+                            ELSE convert_to(repeat(chr(run_symbol), run_length), 'UTF8')
+                        END);
+                        run_end = run_offset + run_length;
+                    END LOOP;
+
+                    parts = array_append(parts, substr(raw, run_end + 1));
+                    RETURN convert_from(
+                        (SELECT string_agg(part, '' ORDER BY n)
+                        FROM unnest(parts) WITH ORDINALITY AS p (part, n)),
+                        'UTF8'
+                    );
+                END
+                $$ LANGUAGE plpgsql IMMUTABLE STRICT PARALLEL SAFE
+                """
+            )
+        )
+
+    def add_dna_kmer_buckets(self):
+        """
+        Adds `dna_kmer_buckets(kmers, k)`, returning the distinct buckets of
+        encoded `kmers` (see `app.search.kmer`), i.e. their prefixes of
+        `KMER_BUCKET_K` nucleotides; must precede creation of the k-mer index.
+        """
+        self.execute(
+            text(
+                f"""
+                CREATE OR REPLACE FUNCTION dna_kmer_buckets(kmers integer[], k integer)
+                RETURNS integer[] AS $$
+                    SELECT array(
+                        SELECT DISTINCT kmer >> (2 * greatest(k - {KMER_BUCKET_K}, 0))
+                        FROM unnest(kmers) AS kmer
+                    )
+                $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+                """
+            )
+        )
+
+    def add_dna_match_offsets(self):
+        """
+        Adds `dna_match_offsets(bases, regex)`, returning the (0-based) offset
+        of every, possibly overlapping, case-insensitive match of `regex` in
+        `bases`; splitting on a zero-width lookahead finds all matches in a
+        single pass (a leading sentinel keeps a match at offset 0).
+        """
+        self.execute(
+            text(
+                """
+                CREATE OR REPLACE FUNCTION dna_match_offsets(bases text, regex text)
+                RETURNS SETOF integer AS $$
+                    SELECT pieces.offset FROM (
+                        SELECT
+                            n,
+                            count(*) OVER () AS total,
+                            (sum(length(piece)) OVER (ORDER BY n) - 1)::integer AS offset
+                        FROM regexp_split_to_table('^' || bases, '(?=' || regex || ')', 'i')
+                            WITH ORDINALITY AS t(piece, n)
+                    ) AS pieces
+                    WHERE pieces.n < pieces.total
+                    ORDER BY pieces.n
+                $$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+                """
+            )
+        )
+
     def exit(self):
         return self._engine.dispose()
+
+
+class AsyncDBService(DBService):
+    """
+    Singleton `DBService` over an async engine (psycopg's `AsyncConnection`),
+    for use from the event loop. Its (sync) methods are run in a greenlet by
+    `run` and `iterate`, and wait on the event loop whenever they wait on the
+    database, through SQLAlchemy's greenlet bridge; so queries are written
+    once, for both services.
+    """
+
+    def __init__(self, config=Config()) -> None:
+        # the singleton is initialized on every instantiation; its engine once
+        if hasattr(self, "_async_engine"):
+            return
+
+        self.config = config
+        self._async_engine: AsyncEngine = create_async_engine(
+            _url(config),
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+        )
+        self._engine = self._async_engine.sync_engine
+        _instrument(self._engine, config)
+        # fan-out slots (see `DBService.fan_out`) per event loop, as asyncio
+        # primitives are bound to the loop they are first used on
+        self._fan_outs = WeakKeyDictionary()
+
+    async def run(self, function: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Runs `function`, executing statements on the async engine, e.g. any
+        method of this service or of a collection over it.
+        """
+        return await greenlet_spawn(function, *args, **kwargs)
+
+    async def iterate(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """
+        Iterates `iterator` (e.g. a stream) as `run` does, closing it once
+        exhausted or on early exit.
+        """
+        end: Any = object()
+
+        try:
+            while (item := await greenlet_spawn(next, iterator, end)) is not end:
+                yield item
+
+        finally:
+            if hasattr(iterator, "close"):
+                await greenlet_spawn(iterator.close)
+
+    def offload(self, function: Callable[..., T], *args) -> T:
+        # run on a worker thread, so the event loop keeps serving other
+        # requests (and statements) meanwhile
+        return await_only(run_in_threadpool(function, *args))
+
+    def _spawn(self, function: Callable[..., T], *args) -> asyncio.Task:
+        # run as a task of its own, i.e. concurrently on the event loop
+        return asyncio.ensure_future(greenlet_spawn(function, *args))
+
+    def _wait(self, futures: List[asyncio.Task]):
+        await_only(asyncio.wait(futures))
+
+    def _acquire(self):
+        loop = asyncio.get_running_loop()
+
+        if loop not in self._fan_outs:
+            self._fan_outs[loop] = asyncio.Semaphore(_fan_outs(self.config))
+
+        await_only(self._fan_outs[loop].acquire())
+
+    def _release(self):
+        self._fan_outs[asyncio.get_running_loop()].release()
+
+    async def aexit(self):
+        return await self._async_engine.dispose()
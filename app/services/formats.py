@@ -0,0 +1,77 @@
+"""
+Incremental parsers of uploaded sequence files; each yields one serialized
+(JSON) sequence at a time, so memory is bounded by the largest record rather
+than by the upload.
+"""
+import json
+from itertools import zip_longest
+from typing import Iterable, Iterator, Tuple
+
+
+def fasta_records(lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Yields the (header, bases) of each FASTA record of `lines`.
+    """
+    header, bases = None, []
+
+    for line in lines:
+        if line.startswith(">"):
+            if header is not None:
+                yield header, "".join(bases)
+
+            header, bases = line[1:].strip(), []
+
+        elif header is not None:
+            bases.append(line.strip())
+
+    if header is not None:
+        yield header, "".join(bases)
+
+
+def fasta_items(lines: Iterable[str], metadata: Iterable[str]) -> Iterator[str]:
+    """
+    Serializes the FASTA records of `lines` with their metadata, the NDJSON
+    `metadata` lines in record order; `benchlingId` defaults to the first
+    token of the record header. Malformed metadata, as well as records and
+    metadata lines left unmatched (when their counts differ), are passed
+    through as incomplete items, i.e. fail validation downstream.
+    """
+    for record, line in zip_longest(fasta_records(lines), _nonblank(metadata)):
+        if record is None:
+            yield line
+            continue
+
+        header, bases = record
+        benchling_id, *_ = header.split() or [None]
+
+        if line is None:
+            yield json.dumps({"benchlingId": benchling_id, "bases": bases})
+            continue
+
+        try:
+            item = {"benchlingId": benchling_id, **json.loads(line), "bases": bases}
+
+        except (TypeError, ValueError):
+            yield line
+            continue
+
+        yield json.dumps(item)
+
+
+def ndjson_items(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yields the serialized sequences of NDJSON `lines`, as is.
+    """
+    return _nonblank(lines)
+
+
+def decoded(lines: Iterable[bytes]) -> Iterator[str]:
+    """
+    Decodes UTF-8 `lines` (e.g. of an uploaded file); undecodable bytes are
+    replaced, i.e. fail validation downstream.
+    """
+    return (line.decode("utf-8", errors="replace") for line in lines)
+
+
+def _nonblank(lines: Iterable[str]) -> Iterator[str]:
+    return (line.strip() for line in lines if line.strip())
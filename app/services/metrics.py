@@ -0,0 +1,288 @@
+"""
+In-process metrics, exposed in the Prometheus text format by `GET /metrics`.
+
+Metrics are recorded under a lock per metric (a dictionary update), so they
+are cheap enough to record on every request and statement; values derived
+from the database (e.g. batch progress) are only computed when scraped, by
+the collectors registered with `REGISTRY`. Metrics are per process.
+"""
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+# latency buckets (seconds), from sub-millisecond statements to slow searches
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# (label values, value) samples of a metric
+Samples = Iterable[Tuple[Dict[str, str], float]]
+
+
+class Metric(ABC):
+    """
+    Metric family of samples by label values.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(labels)} {_value(value)}")
+
+        return lines
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        """
+        Yields the (name suffix, labels, value) of every sample.
+        """
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+
+        for key, value in values:
+            yield "", dict(zip(self.labels, key)), value
+
+
+class Summary(Metric):
+    """
+    Count and sum of observations (e.g. seconds spent), without quantiles.
+    """
+
+    type = "summary"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+
+        with self._lock:
+            observed = self._values.setdefault(key, [0, 0.0])
+            observed[0] += 1
+            observed[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+
+        try:
+            yield
+
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, tuple(v)) for key, v in self._values.items()]
+
+        for key, (count, total) in values:
+            labels = dict(zip(self.labels, key))
+            yield "_count", labels, count
+            yield "_sum", labels, total
+
+
+class Histogram(Summary):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        # count, sum and the (non-cumulative) count of each bucket and +Inf
+        bucket = 2 + bisect_left(self.buckets, value)
+
+        with self._lock:
+            observed = self._values.get(key)
+
+            if observed is None:
+                observed = self._values[key] = [0, 0.0] + [0] * (len(self.buckets) + 1)
+
+            observed[0] += 1
+            observed[1] += value
+            observed[bucket] += 1
+
+    def samples(self):
+        with self._lock:
+            values = [(key, tuple(v)) for key, v in self._values.items()]
+
+        for key, (count, total, *counts) in values:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield "_bucket", {**labels, "le": _value(bound)}, cumulative
+
+            yield "_count", labels, count
+            yield "_sum", labels, total
+
+
+class Collected(Metric):
+    """
+    Metric whose samples are computed by `collect` when scraped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        type: str,
+        collect: Callable[[], Samples],
+    ) -> None:
+        super().__init__(name, help)
+        self.type = type
+        self._collect = collect
+
+    def samples(self):
+        for labels, value in self._collect():
+            yield "", labels, value
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def collector(self, name: str, help: str, type: str = "gauge"):
+        """
+        Registers the decorated function as the collector of metric `name`.
+        """
+
+        def register(collect: Callable[[], Samples]) -> Callable[[], Samples]:
+            self.register(Collected(name, help, type, collect))
+            return collect
+
+        return register
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text format (version 0.0.4).
+        """
+        lines = []
+
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Latency of API requests, until their (streamed) response is sent.",
+        ["method", "route", "status"],
+    )
+)
+db_statement_duration = REGISTRY.register(
+    Histogram(
+        "db_statement_duration_seconds",
+        "Execution time of SQL statements (until their first rows), by caller.",
+        ["caller", "verb"],
+    )
+)
+db_statement_rows = REGISTRY.register(
+    Counter(
+        "db_statement_rows_total",
+        "Rows returned or affected by SQL statements, when known, by caller.",
+        ["caller", "verb"],
+    )
+)
+db_pool_checkout_duration = REGISTRY.register(
+    Histogram(
+        "db_pool_checkout_duration_seconds",
+        "Wait for a pooled (or new) database connection.",
+        ["engine"],
+    )
+)
+model_parse_duration = REGISTRY.register(
+    Summary(
+        "dna_model_parse_seconds",
+        "Time spent building models from database rows.",
+        ["model"],
+    )
+)
+validation_duration = REGISTRY.register(
+    Summary("dna_bases_validation_seconds", "Time spent validating bases.")
+)
+encoding_duration = REGISTRY.register(
+    Summary(
+        "http_response_encoding_seconds",
+        "Time spent encoding streamed responses as JSON.",
+    )
+)
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{k}="{_escaped(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escaped(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -0,0 +1,147 @@
+"""
+Compact binary encodings of nucleotide sequences.
+
+Packed values start with a 2 byte header: the encoding (bits per base) and
+the number of padding symbols at the end of the payload.
+
+* 2-bit: sequences made mostly of `acgt`; 4 bases per byte.
+* 4-bit: any IUPAC nucleotide symbols; 2 bases per byte.
+
+Both encodings map bases to hex digits (4-bit) or pairs of bases to hex
+digits (2-bit), so encoding and decoding run as `str.translate`/`bytes.hex`
+passes in C rather than per-base Python loops; `dna_unpack` mirrors
+`unpack` in SQL.
+
+Payloads hold lowercase bases; what they cannot hold is kept in a list of
+exception runs, flagged by `EXCEPTIONS` in the encoding byte, so bases
+round-trip exactly. The header is then followed by the number of runs (4
+bytes) and the runs themselves, each its offset and length (4 bytes each)
+and symbol (1 byte): 0 for a run of uppercase bases, or else the (ambiguity)
+symbol repeated along the run, which the 2-bit payload holds as `a`. Sparse
+ambiguity codes, e.g. a few runs of `N`, thus keep the 2-bit encoding;
+sequences are packed with whichever encoding is smaller.
+"""
+import re
+import struct
+from itertools import product
+from typing import List, Tuple
+
+# symbols in order of their 4-bit code
+SYMBOLS_4BIT = "acgtuwsmkrybdhvn"
+
+# symbols in order of their 2-bit code
+SYMBOLS_2BIT = "acgt"
+
+HEX_DIGITS = "0123456789abcdef"
+
+# flag of the encoding byte of values followed by exception runs
+EXCEPTIONS = 0x80
+
+# symbol of exception runs of uppercase bases
+UPPERCASE = 0
+
+_TO_NIBBLE = str.maketrans(SYMBOLS_4BIT + SYMBOLS_4BIT.upper(), HEX_DIGITS * 2)
+_FROM_NIBBLE = str.maketrans(HEX_DIGITS, SYMBOLS_4BIT)
+# ambiguity symbols are held as `a` (and restored from their exception run)
+_TO_BASE4 = str.maketrans(SYMBOLS_4BIT + SYMBOLS_4BIT.upper(), ("0123" + "0" * 12) * 2)
+
+# runs of uppercase `ACGT`, or of the same ambiguity symbol, in 2-bit payloads
+_RUNS_2BIT = re.compile(
+    f"[{SYMBOLS_2BIT.upper()}]+|([^{SYMBOLS_2BIT}{SYMBOLS_2BIT.upper()}])\\1*"
+)
+# runs of uppercase symbols in 4-bit payloads
+_RUNS_4BIT = re.compile("[A-Z]+")
+
+_RUN = struct.Struct(">IIB")
+_COUNT = struct.Struct(">I")
+
+# each byte of a 2-bit payload decoded into its 4 bases
+_QUADS = ["".join(q) for q in product(SYMBOLS_2BIT, repeat=4)]
+
+
+def pack(bases: str) -> bytes:
+    """
+    Packs `bases` with the 2-bit encoding, and exception runs for uppercase
+    and ambiguous bases, or the 4-bit one, and exception runs for uppercase
+    bases, whichever is smaller.
+    """
+    runs_2bit = _runs(_RUNS_2BIT, bases)
+    runs_4bit = _runs(_RUNS_4BIT, bases)
+
+    if (
+        len(runs_2bit) * _RUN.size + len(bases) // 4
+        <= len(runs_4bit) * _RUN.size + len(bases) // 2
+    ):
+        pad = -len(bases) % 4
+        digits = bases.translate(_TO_BASE4) + "0" * pad
+        payload = int(digits or "0", 4).to_bytes(len(digits) // 4, "big")
+        return _header(2, pad, runs_2bit) + payload
+
+    pad = len(bases) % 2
+    payload = bytes.fromhex(bases.translate(_TO_NIBBLE) + "0" * pad)
+    return _header(4, pad, runs_4bit) + payload
+
+
+def unpack(packed: bytes) -> str:
+    encoding, pad = packed[0], packed[1]
+    runs = []
+    start = 2
+
+    if encoding & EXCEPTIONS:
+        (count,) = _COUNT.unpack_from(packed, start)
+        start += _COUNT.size
+        runs = list(_RUN.iter_unpack(packed[start : start + count * _RUN.size]))
+        start += count * _RUN.size
+
+    if encoding & ~EXCEPTIONS == 2:
+        bases = "".join(map(_QUADS.__getitem__, packed[start:]))
+
+    else:
+        bases = packed[start:].hex().translate(_FROM_NIBBLE)
+
+    bases = bases[: len(bases) - pad]
+
+    if not runs:
+        return bases
+
+    parts = []
+    end = 0
+
+    for offset, length, symbol in runs:
+        parts.append(bases[end:offset])
+        end = offset + length
+
+        if symbol == UPPERCASE:
+            parts.append(bases[offset:end].upper())
+
+        else:
+            parts.append(chr(symbol) * length)
+
+    parts.append(bases[end:])
+    return "".join(parts)
+
+
+def _runs(pattern: re.Pattern, bases: str) -> List[Tuple[int, int, int]]:
+    """
+    Returns the exception runs of `bases` matched by `pattern`, as offset,
+    length and symbol; ambiguity runs are captured by its group.
+    """
+    return [
+        (
+            match.start(),
+            match.end() - match.start(),
+            UPPERCASE if match.lastindex is None else ord(match.group(1)),
+        )
+        for match in pattern.finditer(bases)
+    ]
+
+
+def _header(encoding: int, pad: int, runs: List[Tuple[int, int, int]]) -> bytes:
+    if not runs:
+        return bytes((encoding, pad))
+
+    return (
+        bytes((encoding | EXCEPTIONS, pad))
+        + _COUNT.pack(len(runs))
+        + b"".join(_RUN.pack(*run) for run in runs)
+    )
@@ -0,0 +1,159 @@
+"""
+Validation of serialized sequences, in-process or in parallel. In parallel,
+serialized sequences are spooled into a memory-mapped file shared with the
+pool processes, which parse and validate them whole (and normalize their
+bases in place), so only the parsed fields, rather than megabase strings, are
+pickled back from the pool; bases are read back from the spool.
+"""
+import json
+import mmap
+from concurrent.futures import Executor
+from itertools import repeat
+from tempfile import NamedTemporaryFile
+from typing import Dict, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.models.dna import LOWERCASE_BASES, DNASequence, check_symbols
+
+# spooled bytes of the items parsed by a task of the pool; large enough to
+# amortize the round trip to a pool process, small enough to spread a chunk
+# of large items across the pool
+TASK_SIZE = 2**20
+
+# span (offset, length) of the bases of a parsed item in the spool, if spooled
+# as-is (i.e. not escaped in the item)
+Span = Optional[Tuple[int, int]]
+
+
+def parse_items(
+    items: List[str], executor: Optional[Executor] = None
+) -> List[Optional[DNASequence]]:
+    """
+    Parses serialized sequences `items` across the processes of `executor`
+    (in-process when omitted); invalid items are parsed as `None`.
+    """
+    if executor is None:
+        # nothing to share, so items are parsed without spooling them
+        return [_checked(*_loads(item)) for item in items]
+
+    with NamedTemporaryFile(prefix="dna-spool-") as spool:
+        # offset and item lengths of each task, of about `TASK_SIZE` bytes
+        tasks: List[Tuple[int, List[int]]] = []
+
+        for item in items:
+            if not tasks or spool.tell() - tasks[-1][0] >= TASK_SIZE:
+                tasks.append((spool.tell(), []))
+
+            # newline delimited, so the spool is never empty
+            tasks[-1][1].append(spool.write(item.encode() + b"\n"))
+
+        spool.flush()
+        parsed = executor.map(_parse_span, repeat(spool.name), *zip(*tasks))
+
+        with mmap.mmap(spool.fileno(), 0, access=mmap.ACCESS_READ) as spooled:
+            return [
+                _with_bases(sequence, span, spooled)
+                for task in parsed
+                for sequence, span in task
+            ]
+
+
+def _parse_span(
+    path: str, offset: int, lengths: List[int]
+) -> List[Tuple[Optional[DNASequence], Span]]:
+    """
+    Parses and validates the items spooled from `offset` in `path`, of
+    `lengths`; returns each parsed item without its bases, which are
+    normalized in place when `LOWERCASE_BASES` is set, and their span.
+    """
+    with open(path, "r+b") as spool, mmap.mmap(spool.fileno(), 0) as spooled:
+        parsed = []
+
+        for length in lengths:
+            parsed.append(_parse_spooled(spooled, offset, length))
+            offset += length
+
+        return parsed
+
+
+def _parse_spooled(
+    spooled: mmap.mmap, offset: int, length: int
+) -> Tuple[Optional[DNASequence], Span]:
+    item = spooled[offset : offset + length]
+    record, bases = _loads(item)
+
+    try:
+        symbols = check_symbols(bases, lower=LOWERCASE_BASES)
+
+    except ValueError:
+        return None, None
+
+    sequence = _as_sequence(record, b"")
+    # the bases are found as-is in the item unless escaped, e.g. as `\u0061`
+    start = item.find(b'"' + bases + b'"') if sequence is not None else -1
+
+    if start < 0:
+        return _as_sequence(record, symbols), None
+
+    start += offset + 1
+
+    if LOWERCASE_BASES:
+        spooled[start : start + len(symbols)] = symbols
+
+    return sequence, (start, len(symbols))
+
+
+def _with_bases(
+    sequence: Optional[DNASequence], span: Span, spooled: mmap.mmap
+) -> Optional[DNASequence]:
+    """
+    Reads the (normalized) bases of parsed `sequence` back from `span` of the
+    spool.
+    """
+    if sequence is not None and span is not None:
+        offset, length = span
+        sequence.bases = spooled[offset : offset + length].decode("ascii")
+
+    return sequence
+
+
+def _loads(item: Union[str, bytes]) -> Tuple[Optional[Dict], bytes]:
+    """
+    Splits serialized sequence `item` into its fields and its bases (as
+    bytes); fields are `None` when `item` is malformed.
+    """
+    try:
+        record = json.loads(item)
+        return record, record.pop("bases").encode("ascii")
+
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None, b""
+
+
+def _checked(record: Optional[Dict], bases: bytes) -> Optional[DNASequence]:
+    """
+    Validates (and normalizes) `bases` in-process, then parses `record`.
+    """
+    try:
+        bases = check_symbols(bases, lower=LOWERCASE_BASES)
+
+    except ValueError:
+        return None
+
+    return _as_sequence(record, bases)
+
+
+def _as_sequence(record: Optional[Dict], bases: bytes) -> Optional[DNASequence]:
+    if record is None:
+        return None
+
+    try:
+        # the remaining fields are validated here, bases were checked already
+        sequence = DNASequence.parse_obj({**record, "bases": ""})
+
+    except ValidationError:
+        return None
+
+    sequence.bases = bases.decode("ascii")
+    return sequence
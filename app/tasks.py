@@ -1,11 +1,54 @@
-from operator import attrgetter
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import get_context
+
 from app.collections.dna import DNASequenceCollection
-from app.models.dna import DNASequence
+from app.models.dna import Status
 from app.services.db import DBService
+from app.services.validation import parse_items
+
+
+def dna_sequences_batch_update(batch_id: int):
+    """
+    Processes the pending items of (claimed) batch `batch_id` in chunks of
+    `batch_chunk_size`, committing each chunk (with its k-mers and chunked
+    bases) together with the batch progress; after a crash, processing
+    resumes from the last committed chunk. The batch is locked while a chunk
+    is processed, and its lease renewed with every chunk. Items are
+    validated across `validation_processes` processes (in-process when 0).
+    """
+    with DBService() as db, _pool(db.config.validation_processes) as executor:
+        try:
+            while True:
+                # each chunk is read, ingested and indexed in a unit of work
+                with DNASequenceCollection() as dna:
+                    if not db.lock_batch(batch_id):
+                        # e.g. completed by a worker that claimed it once its lease expired
+                        return
+
+                    items = db.get_batch_items(batch_id, db.config.batch_chunk_size)
+
+                    if not items:
+                        break
+
+                    # invalid items are counted as failed rather than failing the batch
+                    dna_list = list(
+                        filter(None, parse_items([i.item for i in items], executor))
+                    )
+
+                    dna.add_to_batch(
+                        batch_id, dna_list, through=items[-1].n, processed=len(items)
+                    )
+
+        except Exception:
+            db.set_batch_status(batch_id, Status.FAILED)
+            raise
+
+        db.set_batch_status(batch_id, Status.COMPLETED)
+
 
+def _pool(processes: int):
+    if processes:
+        return ProcessPoolExecutor(processes, mp_context=get_context("spawn"))
 
-def dna_sequences_batch_update(batch_id: int, dna_list: List[DNASequence]):
-    with DBService() as db, DNASequenceCollection() as dna:
-        dna_batch = dna.update(dna_list)
-        db.update_batch(batch_id, list(map(attrgetter("id"), dna_batch)))
+    return nullcontext()
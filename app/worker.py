@@ -0,0 +1,77 @@
+"""
+Batch worker; processes the batches queued in the `batch` table.
+
+Runs `--processes` worker processes (default=CPU count), each claiming one
+batch at a time, independently of the API:
+
+    python -m app.worker --processes 4
+"""
+import logging
+import os
+import time
+from argparse import ArgumentParser
+from multiprocessing import get_context
+
+from app.services.db import DBService
+from app.tasks import dna_sequences_batch_update
+
+logger = logging.getLogger(__name__)
+
+
+def work(poll_interval: float):
+    """
+    Processes claimed batches until interrupted, polling the queue every
+    `poll_interval` seconds while it is empty.
+    """
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(processName)s %(message)s"
+    )
+    db = DBService()
+
+    while True:
+        batch_id = db.claim_batch()
+
+        if batch_id is None:
+            time.sleep(poll_interval)
+            continue
+
+        logger.info("processing batch %d", batch_id)
+
+        try:
+            dna_sequences_batch_update(batch_id)
+
+        except Exception:
+            logger.exception("batch %d failed", batch_id)
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--poll-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # spawned, rather than forked, so each process opens its own connections;
+    # not daemonic, as daemonic processes may not start validation pools
+    context = get_context("spawn")
+    processes = [
+        context.Process(target=work, args=(args.poll_interval,))
+        for _ in range(args.processes)
+    ]
+
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Generates a deterministic synthetic corpus of DNA sequences as NDJSON.
+
+Each sequence is derived from the seed and its index alone, so any slice of a
+corpus (or a pattern sampled from it) is reproduced without generating the
+rest, and corpora of any size are streamed rather than held in memory:
+
+    python -m benchmarks.corpus --sequences 1000 --length 10000 > corpus.ndjson
+"""
+import random
+import sys
+from argparse import ArgumentParser
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+from typing import Iterator, List
+
+from app.models.dna import DNASequence
+from app.models.user import User
+
+NUCLEOTIDES = "acgt"
+AMBIGUITY_CODES = "wsmkrybdhvn"
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Corpus:
+    """
+    Synthetic corpus of `sequences` sequences of `length` bases (uniformly
+    within `length * (1 ± spread)`), a fraction `ambiguity` of which are
+    IUPAC ambiguity codes; a fraction `duplicates` of the sequences repeat
+    the bases of an earlier one. Sequences are created by `users` users.
+    """
+
+    sequences: int = 1000
+    length: int = 10000
+    spread: float = 0.0
+    ambiguity: float = 0.0
+    duplicates: float = 0.0
+    users: int = 10
+    seed: int = 0
+
+    def __len__(self) -> int:
+        return self.sequences
+
+    def __iter__(self) -> Iterator[DNASequence]:
+        return map(self.sequence, range(self.sequences))
+
+    def batches(self, size: int) -> Iterator[List[DNASequence]]:
+        sequences = iter(self)
+
+        while batch := list(islice(sequences, size)):
+            yield batch
+
+    def sequence(self, i: int) -> DNASequence:
+        return DNASequence(
+            # IDs fit in 16 characters: `seq_` and 12 hex digits
+            benchling_id=f"seq_{self.seed % 256:02x}{i:010x}",
+            name=f"benchmark-{i}",
+            created_at=EPOCH + timedelta(minutes=i),
+            bases=self.bases(i),
+            creator=User(
+                benchling_id=f"ent_{self.seed % 256:02x}{i % self.users:010x}",
+                name=f"Benchmark {i % self.users}",
+                handle=f"bench{i % self.users}",
+            ),
+        )
+
+    def bases(self, i: int) -> str:
+        rng = self._rng(i)
+
+        # duplicates resolve to the (original) sequence they repeat
+        while i and rng.random() < self.duplicates:
+            i = rng.randrange(i)
+            rng = self._rng(i)
+
+        length = round(self.length * (1 + self.spread * (2 * rng.random() - 1)))
+        symbols = NUCLEOTIDES + AMBIGUITY_CODES
+        weights = [(1 - self.ambiguity) / len(NUCLEOTIDES)] * len(NUCLEOTIDES) + [
+            self.ambiguity / len(AMBIGUITY_CODES)
+        ] * len(AMBIGUITY_CODES)
+
+        return "".join(
+            rng.choices(
+                symbols, cum_weights=list(accumulate(weights)), k=max(length, 1)
+            )
+        )
+
+    def patterns(self, count: int, length: int, seed: int = 0) -> List[str]:
+        """
+        Samples `count` patterns of `length` bases from the corpus, so every
+        search has at least one hit.
+        """
+        rng = random.Random(f"patterns:{self.seed}:{seed}")
+        patterns = []
+
+        while len(patterns) < count:
+            bases = self.bases(rng.randrange(self.sequences))
+
+            if len(bases) >= length:
+                start = rng.randrange(len(bases) - length + 1)
+                patterns.append(bases[start : start + length])
+
+        return patterns
+
+    def _rng(self, i: int) -> random.Random:
+        return random.Random(f"{self.seed}:{i}")
+
+
+def add_arguments(parser: ArgumentParser):
+    parser.add_argument("--sequences", type=int, default=1000)
+    parser.add_argument("--length", type=int, default=10000)
+    parser.add_argument("--spread", type=float, default=0.0)
+    parser.add_argument("--ambiguity", type=float, default=0.0)
+    parser.add_argument("--duplicates", type=float, default=0.0)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def from_arguments(args) -> Corpus:
+    return Corpus(
+        sequences=args.sequences,
+        length=args.length,
+        spread=args.spread,
+        ambiguity=args.ambiguity,
+        duplicates=args.duplicates,
+        users=args.users,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    add_arguments(parser)
+    corpus = from_arguments(parser.parse_args())
+
+    for sequence in corpus:
+        sys.stdout.write(sequence.json(by_alias=True, exclude_unset=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
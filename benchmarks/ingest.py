@@ -0,0 +1,58 @@
+"""
+Compares `DNASequenceCollection.update` throughput across ingest paths.
+
+Synthetic sequences are ingested in batches through `COPY` into a staging
+table and through a single `INSERT ... VALUES` statement, reporting
+throughput (including k-mer indexing and chunking) and peak client memory.
+Sequences are stored, so run against a disposable database:
+
+    python -m benchmarks.ingest --sequences 1000 --length 10000 --batch 200
+"""
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from app.collections.dna import DNASequenceCollection
+from app.services.db import DBService
+from benchmarks.corpus import Corpus
+
+INGEST_PATHS = {"copy": True, "values": False}
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sequences", type=int, default=1000)
+    parser.add_argument("--length", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for n, (path, copy_ingest) in enumerate(INGEST_PATHS.items()):
+        DBService().config.copy_ingest = copy_ingest
+        # distinct corpora, as sequences already stored are skipped
+        corpus = Corpus(args.sequences, args.length, seed=args.seed + n)
+        sequences = list(corpus)
+        elapsed = 0.0
+        tracemalloc.start()
+
+        for i in range(0, len(sequences), args.batch):
+            start = time.perf_counter()
+
+            # each ingest run is a unit of work, committed (and timed) on its own
+            with DNASequenceCollection() as dna:
+                dna.update(sequences[i : i + args.batch])
+
+            elapsed += time.perf_counter() - start
+
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(
+            f"{path:>8}: {len(sequences) / elapsed:.1f} sequences/s "
+            f"{len(sequences) * args.length / elapsed / 1e6:.2f} Mbp/s "
+            f"total={elapsed:.2f}s peak={peak / 2**20:.1f}MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Compares `DNASequenceCollection.search` latency across search engines.
+
+Patterns are sampled from stored sequences (server-side, at random IDs) so
+every search has at least one hit; `--max-mismatches`/`--max-edits` benchmark approximate search instead.
+Run against a populated database:
+
+    python -m benchmarks.search --patterns 50 --length 12
+    python -m benchmarks.search --patterns 50 --length 36 --max-edits 2
+"""
+import random
+import statistics
+import time
+from argparse import ArgumentParser
+from typing import Optional
+
+from sqlalchemy import Integer, func, select, true
+
+from app.collections.dna import DNASequenceCollection
+from app.models.dna import SearchEngine
+from app.services.db import DBService
+
+dna_sequence = DBService.dna_sequence
+
+
+def sample_patterns(db: DBService, count: int, length: int, seed: int):
+    """
+    Samples `count` patterns of `length` bases from stored sequences,
+    server-side, so only the patterns are fetched rather than the corpus.
+    """
+    rng = random.Random(seed)
+    low, high = db.execute(
+        select(func.min(dna_sequence.c.id), func.max(dna_sequence.c.id))
+    ).one()
+    patterns = []
+
+    while low is not None and len(patterns) < count:
+        position = rng.random()
+        # wraps around to the lowest ID past the last sequence long enough
+        pattern = sample_pattern(
+            db, rng.randint(low, high), position, length
+        ) or sample_pattern(db, low, position, length)
+
+        if pattern is None:
+            # no sequence is long enough
+            break
+
+        patterns.append(pattern)
+
+    return patterns
+
+
+def sample_pattern(
+    db: DBService, id: int, position: float, length: int
+) -> Optional[str]:
+    """
+    Returns the `length` bases at relative `position` of the first sequence
+    of at least `length` bases from `id` on, if any.
+    """
+    bases = DBService.dna_sequence_unpacked.c.bases
+    start = func.floor(position * (func.length(bases) - length + 1)).cast(Integer)
+
+    return db.execute(
+        select(func.substr(bases, start + 1, length))
+        .join_from(dna_sequence, DBService.dna_sequence_unpacked, true())
+        .where(dna_sequence.c.id >= id, func.length(bases) >= length)
+        .order_by(dna_sequence.c.id)
+        .limit(1)
+    ).scalar()
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--patterns", type=int, default=50)
+    parser.add_argument("--length", type=int, default=12)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-mismatches", type=int)
+    parser.add_argument("--max-edits", type=int)
+    args = parser.parse_args()
+
+    with DNASequenceCollection() as dna:
+        patterns = sample_patterns(DBService(), args.patterns, args.length, args.seed)
+
+        if not patterns:
+            parser.error(f"no stored sequence of at least {args.length} bases")
+
+        for engine in SearchEngine:
+            if engine is SearchEngine.KMER and not DBService().config.kmer_index:
+                continue
+
+            timings = []
+
+            for pattern in patterns:
+                start = time.perf_counter()
+                list(
+                    dna.search(
+                        pattern,
+                        engine,
+                        max_mismatches=args.max_mismatches,
+                        max_edits=args.max_edits,
+                    )
+                )
+                timings.append(time.perf_counter() - start)
+
+            timings.sort()
+            print(
+                f"{engine.value:>8}: mean={statistics.mean(timings) * 1e3:.2f}ms "
+                f"p50={timings[len(timings) // 2] * 1e3:.2f}ms "
+                f"p95={timings[int(len(timings) * 0.95)] * 1e3:.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Latency statistics of benchmarked operations, and results saved as JSON for
+comparison between revisions.
+"""
+import json
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+PERCENTILES = (50, 95, 99)
+
+
+class Timings:
+    """
+    Durations (in seconds) of the runs of an operation, and the units (e.g.
+    sequences) and bases they processed, if counted.
+    """
+
+    def __init__(self) -> None:
+        self.durations: List[float] = []
+        self.units = 0
+        self.bases = 0
+
+    @contextmanager
+    def run(self, units: int = 1) -> Iterator[None]:
+        start = time.perf_counter()
+        yield
+        self.durations.append(time.perf_counter() - start)
+        self.units += units
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Returns the number of runs, the throughput (units, and Mbp if counted,
+        per second of total duration) and the mean and percentile latencies
+        in milliseconds.
+        """
+        durations = sorted(self.durations)
+        total = sum(durations)
+        summary = {
+            "runs": len(durations),
+            "throughput": self.units / total if total else 0.0,
+            "mean": statistics.mean(durations) * 1e3,
+        }
+
+        if self.bases:
+            summary["mbp_throughput"] = self.bases / total / 1e6 if total else 0.0
+
+        for p in PERCENTILES:
+            summary[f"p{p}"] = percentile(durations, p) * 1e3
+
+        return summary
+
+
+def percentile(durations: List[float], p: float) -> float:
+    """
+    Returns the `p`th percentile of sorted `durations` (nearest rank).
+    """
+    return durations[
+        min(max(round(p / 100 * len(durations)) - 1, 0), len(durations) - 1)
+    ]
+
+
+def revision() -> str:
+    """
+    Returns the git revision of the working tree, suffixed when modified.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short=12", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+    return f"{commit}-dirty" if dirty else commit
+
+
+def save(results: Dict, directory: Path) -> Path:
+    """
+    Saves `results` under `directory`, named after the revision and time.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / (
+        f"{results['revision']}-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}.json"
+    )
+    path.write_text(json.dumps(results, indent=2))
+
+    return path
+
+
+def report(results: Dict, baseline: Optional[Dict] = None):
+    """
+    Prints the summary of each operation of `results`, with the change of
+    each latency relative to `baseline` when given.
+    """
+    baseline = (baseline or {}).get("operations", {})
+
+    for name, summary in results["operations"].items():
+        line = (
+            f"{name:>28}: {summary['throughput']:>10.1f}/s "
+            f"mean={summary['mean']:.2f}ms"
+        )
+
+        if "mbp_throughput" in summary:
+            line += f" {summary['mbp_throughput']:.2f}Mbp/s"
+
+        for p in PERCENTILES:
+            key = f"p{p}"
+            line += f" {key}={summary[key]:.2f}ms"
+
+            if name in baseline and baseline[name][key]:
+                line += f" ({summary[key] / baseline[name][key] - 1:+.0%})"
+
+        print(line)
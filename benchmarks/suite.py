@@ -0,0 +1,235 @@
+"""
+Benchmarks ingest, collection methods and API endpoints on a synthetic corpus.
+
+The corpus (see `benchmarks.corpus`) is loaded through an ingest path, then
+every operation is timed `--runs` times on sampled arguments, reporting its
+throughput and p50/p95/p99 latencies; results are saved under `--results`,
+and compared with those of another revision given as `--baseline`. Sequences
+are stored, so run against a disposable database; `--skip-ingest` reuses the
+corpus loaded by a previous run:
+
+    python -m benchmarks.suite --sequences 1000 --length 10000 --ingest batch
+    python -m benchmarks.suite --sequences 1000 --length 10000 --skip-ingest \\
+        --baseline benchmarks/results/<revision>-<time>.json
+"""
+import json
+import random
+from argparse import ArgumentParser
+from dataclasses import asdict
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app.collections.dna import DNASequenceCollection
+from app.collections.user import UserCollection
+from app.main import app
+from app.models.dna import SearchEngine
+from app.search import regex as search_regex
+from app.services.db import AsyncDBService, DBService
+from app.tasks import dna_sequences_batch_update
+from benchmarks import corpus as corpora
+from benchmarks.corpus import Corpus
+from benchmarks.stats import Timings, report, revision, save
+
+INGEST_PATHS = ("batch", "copy", "values", "api")
+
+
+def ingest(
+    db: DBService, corpus: Corpus, path: str, size: int, client: TestClient
+) -> Tuple[Timings, List[int]]:
+    """
+    Loads `corpus` through `path`, `size` sequences at a time; returns the
+    timings of each load and the IDs of the batches loaded, if any.
+    """
+    timings, batch_ids = Timings(), []
+    db.config.copy_ingest = path != "values"
+
+    for sequences in corpus.batches(size):
+        timings.bases += sum(len(s.bases) for s in sequences)
+
+        with timings.run(len(sequences)):
+            if path == "batch":
+                # queued and processed as a batch worker would
+                batch_ids.append(db.init_batch(s.json() for s in sequences))
+                dna_sequences_batch_update(db.claim_batch())
+
+            elif path == "api":
+                client.post(
+                    "/dna:bulk",
+                    content="["
+                    + ",".join(
+                        s.json(by_alias=True, exclude_unset=True) for s in sequences
+                    )
+                    + "]",
+                    headers={"content-type": "application/json"},
+                ).raise_for_status()
+
+            else:
+                with DNASequenceCollection(db) as dna:
+                    dna.update(sequences)
+
+    return timings, batch_ids
+
+
+def operations(
+    dna: DNASequenceCollection,
+    client: TestClient,
+    corpus: Corpus,
+    args,
+    ids: List[int],
+    user_ids: List[int],
+    batch_ids: List[int],
+) -> Dict[str, Callable[[random.Random], object]]:
+    """
+    Returns each benchmarked operation, run on arguments sampled with a
+    random generator.
+    """
+    limit, window = args.limit, args.window
+    patterns = corpus.patterns(args.runs + args.warmup, args.pattern_length)
+
+    def pattern(rng: random.Random) -> str:
+        return rng.choice(patterns)
+
+    def regex(rng: random.Random) -> str:
+        p = pattern(rng)
+        return p[: len(p) // 2] + "." + p[len(p) // 2 + 1 :]
+
+    def panel(rng: random.Random) -> List[str]:
+        return corpus.patterns(
+            args.panel, args.pattern_length, seed=rng.getrandbits(32)
+        )
+
+    def start(rng: random.Random) -> int:
+        return rng.randrange(max(corpus.length - window, 1))
+
+    def get(path: str, **params):
+        response = client.get(path, params=params)
+        response.raise_for_status()
+        return response.content
+
+    ops = {
+        "dna.get": lambda rng: dna[rng.choice(ids)],
+        "dna.page": lambda rng: list(dna.page(rng.choice(ids), limit)),
+        "dna.bases": lambda rng: "".join(
+            dna.bases(rng.choice(ids), (s := start(rng)), s + window)
+        ),
+        "dna.by_user": lambda rng: list(dna.by_user(rng.choice(user_ids), limit=limit)),
+        "dna.regex_search": lambda rng: list(
+            dna.regex_search(search_regex.compile(regex(rng)), limit=limit)
+        ),
+        "dna.multi_search": lambda rng: list(
+            dna.multi_search(panel(rng), counts_only=True)
+        ),
+        "GET /dna": lambda rng: get("/dna", after_id=rng.choice(ids), limit=limit),
+        "GET /dna/{id}": lambda rng: get(f"/dna/{rng.choice(ids)}"),
+        "GET /dna/{id}/bases": lambda rng: get(
+            f"/dna/{rng.choice(ids)}/bases", start=(s := start(rng)), end=s + window
+        ),
+        "GET /dna/search/regex": lambda rng: get(
+            "/dna/search/regex", regex=regex(rng), limit=limit
+        ),
+        "POST /dna/search:multi": lambda rng: client.post(
+            "/dna/search:multi", json={"patterns": panel(rng), "countsOnly": True}
+        ).raise_for_status(),
+        "GET /users/{id}/dna": lambda rng: get(
+            f"/users/{rng.choice(user_ids)}/dna", limit=limit
+        ),
+    }
+
+    for engine in SearchEngine:
+        if engine is SearchEngine.KMER and not DBService().config.kmer_index:
+            continue
+
+        ops[f"dna.search[{engine.value}]"] = lambda rng, e=engine: list(
+            dna.search(pattern(rng), e, limit=limit)
+        )
+        ops[f"dna.hits[{engine.value}]"] = lambda rng, e=engine: list(
+            dna.hits(pattern(rng), e, limit=limit)
+        )
+        ops[f"GET /dna/search/[{engine.value}]"] = lambda rng, e=engine: get(
+            "/dna/search/", pattern=pattern(rng), engine=e.value, limit=limit
+        )
+        ops[f"GET /dna/search/hits[{engine.value}]"] = lambda rng, e=engine: get(
+            "/dna/search/hits", pattern=pattern(rng), engine=e.value, limit=limit
+        )
+
+    if batch_ids:
+        ops["dna.by_batch"] = lambda rng: list(
+            dna.by_batch(rng.choice(batch_ids), limit=limit)
+        )
+        ops["GET /dna/batch/{id}"] = lambda rng: get(
+            f"/dna/batch/{rng.choice(batch_ids)}", limit=limit
+        )
+
+    return dict(sorted(ops.items()))
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    corpora.add_arguments(parser)
+    parser.add_argument("--ingest", choices=INGEST_PATHS, default="batch")
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--skip-ingest", action="store_true")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--window", type=int, default=1000)
+    parser.add_argument("--pattern-length", type=int, default=16)
+    parser.add_argument("--panel", type=int, default=100)
+    parser.add_argument("--cache", action="store_true")
+    parser.add_argument("--results", type=Path, default=Path("benchmarks/results"))
+    parser.add_argument("--baseline", type=Path)
+    args = parser.parse_args()
+
+    corpus = corpora.from_arguments(args)
+    db = DBService()
+
+    # repeated arguments would otherwise measure cache hits
+    if not args.cache:
+        db.config.cache_size = AsyncDBService().config.cache_size = 0
+
+    results = {
+        "revision": revision(),
+        "corpus": asdict(corpus),
+        "config": db.config.dict(exclude={"db_password"}),
+        "operations": {},
+    }
+
+    with TestClient(app) as client:
+        batch_ids = []
+
+        if not args.skip_ingest:
+            timings, batch_ids = ingest(db, corpus, args.ingest, args.batch, client)
+            results["operations"][f"ingest[{args.ingest}]"] = timings.summary()
+
+        dna_sequence = DBService.dna_sequence
+        ids = [r.id for r in db.execute(select(dna_sequence.c.id))]
+        user_ids = [u.id for u in UserCollection(db)]
+        rng = random.Random(args.seed)
+
+        # statements of each operation run in transactions of their own
+        dna = DNASequenceCollection(db)
+        ops = operations(dna, client, corpus, args, ids, user_ids, batch_ids)
+
+        for name, operation in ops.items():
+            timings = Timings()
+
+            for run in range(args.warmup + args.runs):
+                if run < args.warmup:
+                    operation(rng)
+                    continue
+
+                with timings.run():
+                    operation(rng)
+
+            results["operations"][name] = timings.summary()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    report(results, baseline)
+    print(f"saved {save(results, args.results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compares the bulk (byte translation) bases validator with per-symbol validation.
+
+Also compares parsing a batch of `--items` serialized sequences in-process and
+across a pool of `--processes` processes. Runs without a database:
+
+    python -m benchmarks.validation --length 3000000 --repeat 5 --items 32
+"""
+import json
+import os
+import random
+import time
+import timeit
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from typing import Tuple
+
+from app.models.dna import check_bases, is_iupac
+from app.services.validation import parse_items
+
+
+def per_symbol(bases: str) -> str:
+    """
+    Validator prior to bulk validation.
+    """
+    if all(map(is_iupac, bases.lower())):
+        return bases
+
+    raise ValueError("invalid nucleotide symbol")
+
+
+def timed(f) -> Tuple[float, float]:
+    """
+    Returns the wall-clock and CPU (of this process) time of calling `f`.
+    """
+    started, cpu = time.perf_counter(), time.process_time()
+    f()
+    return time.perf_counter() - started, time.process_time() - cpu
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--length", type=int, default=3_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--items", type=int, default=32)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    bases = "".join(rng.choices("ACGTacgtN", k=args.length))
+
+    validators = {
+        "symbol": per_symbol,
+        "bulk": check_bases,
+        "bulk+lower": lambda b: check_bases(b, lower=True),
+    }
+    timings = {
+        name: min(timeit.repeat(lambda: f(bases), number=1, repeat=args.repeat))
+        for name, f in validators.items()
+    }
+
+    for name, timing in timings.items():
+        print(
+            f"{name:>10}: {timing * 1e3:.2f}ms "
+            f"({timings['symbol'] / timing:.0f}x, {args.length / timing / 1e6:.0f} Mbp/s)"
+        )
+
+    items = [
+        json.dumps(
+            {
+                "benchlingId": f"seq_{i}",
+                "name": f"benchmark-{i}",
+                "createdAt": datetime.now(timezone.utc).isoformat(),
+                "bases": bases,
+            }
+        )
+        for i in range(args.items)
+    ]
+
+    with ProcessPoolExecutor(
+        args.processes, mp_context=get_context("spawn")
+    ) as executor:
+        # warms up the pool
+        parse_items(items[:1], executor)
+
+        # the pool parses items as the parent does
+        assert [s.dict() for s in parse_items(items, executor)] == [
+            s.dict() for s in parse_items(items)
+        ]
+
+        for name, pool in (("in-process", None), (f"{args.processes} procs", executor)):
+            # CPU time of this process is the serial share of parsing, which
+            # bounds the speedup of the pool
+            timing, cpu = min(
+                timed(lambda: parse_items(items, pool)) for _ in range(args.repeat)
+            )
+            print(
+                f"{name:>10}: {timing * 1e3:.2f}ms, {cpu * 1e3:.2f}ms CPU in-process "
+                f"({args.items * args.length / timing / 1e6:.0f} Mbp/s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
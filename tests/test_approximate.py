@@ -0,0 +1,23 @@
+import pytest
+
+from app.search.approximate import max_errors, seeds
+
+
+def test_seeds_cover_pattern():
+    assert seeds("acgtacgtac", 2) == [(0, "acg"), (3, "tac"), (6, "gtac")]
+
+
+def test_seeds_at_least_min_length():
+    assert max_errors(10, 3) == 2
+    assert [len(piece) for _, piece in seeds("acgtacgtac", 2, 3)] == [3, 3, 4]
+
+    with pytest.raises(ValueError):
+        seeds("acgtacgtac", 3, 3)
+
+
+def test_exact_seed_of_short_pattern():
+    assert max_errors(2, 3) == 0
+    assert seeds("ac", 0, 3) == [(0, "ac")]
+
+    with pytest.raises(ValueError):
+        seeds("ac", 2)
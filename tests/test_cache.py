@@ -0,0 +1,37 @@
+from app.services.cache import LocalStore, PostgresStore
+
+
+class RecordingDB:
+    """
+    Database service recording the statements executed, without results.
+    """
+
+    def __init__(self) -> None:
+        self.statements = []
+
+    def execute(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        return self
+
+    def one_or_none(self):
+        return None
+
+
+def test_local_store_evicts_least_recently_used():
+    store = LocalStore(capacity=4)
+    store.put(None, "a", "1", b"aa")
+    store.put(None, "b", "1", b"bb")
+    store.get(None, "a")
+    store.put(None, "c", "1", b"cc")
+
+    assert store.get(None, "b") is None
+    assert store.get(None, "a") == ("1", b"aa")
+    assert store.usage(None) == (2, 4) and store.evictions == 1
+
+
+def test_postgres_store_queries_through_service_of_caller():
+    db = RecordingDB()
+
+    assert PostgresStore(capacity=4).get(db, "a") is None
+    (statement,) = db.statements
+    assert statement.table.name == "cache"
@@ -0,0 +1,117 @@
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import CompoundSelect, Select
+from sqlalchemy.dialects import postgresql
+
+from app.collections.dna import DNASequenceCollection, _kmer_candidates, unfiltered
+from app.config import Config
+from app.models.dna import DNAMultiSearchRequest, SearchEngine, Strand
+from app.search import multi
+from app.search.regex import And, Or, compile
+
+K = 10
+
+
+def render(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+def test_kmer_candidates_of_literal():
+    assert isinstance(_kmer_candidates("acgtacgtacgt", K), Select)
+    assert _kmer_candidates("acgt", K) is None
+
+
+def test_kmer_candidates_of_and_intersects_indexable_factors():
+    candidates = _kmer_candidates(And({"acgtacgtacgt", "ttttggggcccc", "ac"}), K)
+
+    assert isinstance(candidates, CompoundSelect)
+    assert render(candidates).count("INTERSECT") == 1
+
+
+def test_kmer_candidates_of_and_without_indexable_factors():
+    assert _kmer_candidates(And({"acgt", "ttgg"}), K) is None
+
+
+def test_kmer_candidates_of_or_unions_factors():
+    candidates = _kmer_candidates(Or({"acgtacgtacgt", "ttttggggcccc"}), K)
+
+    assert isinstance(candidates, CompoundSelect)
+    assert "UNION" in render(candidates)
+
+
+def test_kmer_candidates_of_or_with_unindexable_factor():
+    assert _kmer_candidates(Or({"acgtacgtacgt", "acgt"}), K) is None
+
+
+def test_kmer_candidates_of_regex_factors():
+    factors = compile("acgtacgtacgt.acgtacgtac").factors
+
+    assert isinstance(factors, And)
+    assert _kmer_candidates(factors, K) is not None
+
+
+class RecordingDB:
+    """
+    Database service recording the statements streamed, without results.
+    """
+
+    def __init__(self) -> None:
+        self.config = Config(cache_size=0)
+        self.statements = []
+
+    def stream(self, statement, *args, **kwargs):
+        self.statements.append(statement)
+        self.timeout = kwargs.get("timeout")
+        return iter(())
+
+    def offload(self, function, *args):
+        return function(*args)
+
+
+@pytest.mark.parametrize("strand", list(Strand))
+def test_multi_search_kmer_with_ambiguity_codes(strand):
+    db = RecordingDB()
+    dna = DNASequenceCollection(db)
+
+    results = list(
+        dna.multi_search(["acgtacgtacgtnnacgtacgtac"], SearchEngine.KMER, strand)
+    )
+
+    assert [r.sequence_count for r in results] == [0]
+    (statement,) = db.statements
+    assert "dna_kmer" in render(statement)
+
+
+def test_multi_search_is_bounded():
+    db = RecordingDB()
+    list(DNASequenceCollection(db).multi_search(["acgtacgtacgt"]))
+
+    (statement,) = db.statements
+    assert "LIMIT" in render(statement)
+    assert db.timeout == db.config.regex_timeout
+
+
+@pytest.mark.parametrize(
+    "engine, rejected",
+    [
+        (SearchEngine.TRIGRAM, ["annnnna"]),
+        (SearchEngine.KMER, ["acgtnacgt", "annnnna"]),
+    ],
+)
+def test_unfiltered(engine, rejected):
+    patterns = ["acgtacgtacgtac", "acgtnacgt", "annnnna"]
+
+    assert unfiltered(patterns, engine, Config(kmer_size=12)) == rejected
+
+
+def test_multi_search_request_state_limit():
+    # both strands double the states of the panel
+    patterns = ["acgt" * 64] * (multi.STATE_LIMIT // 256)
+
+    assert DNAMultiSearchRequest(patterns=patterns, strand=Strand.FORWARD)
+
+    with pytest.raises(ValidationError):
+        DNAMultiSearchRequest(patterns=patterns, strand=Strand.BOTH)
+
+    with pytest.raises(ValidationError):
+        DNAMultiSearchRequest(patterns=patterns * 2)
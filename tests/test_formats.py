@@ -0,0 +1,39 @@
+import json
+from tempfile import SpooledTemporaryFile
+
+from app.services.formats import decoded, fasta_items
+
+FASTA = [">s1 first\n", "acgt\n", "ac\n", ">s2\n", "gg\n", ">s3\n", "tt\n"]
+METADATA = {"name": "sequence", "createdAt": "2020-01-01T00:00:00"}
+
+
+def test_fasta_items_with_metadata():
+    items = list(fasta_items(FASTA[:5], [json.dumps(METADATA)] * 2))
+
+    assert [json.loads(i) for i in items] == [
+        {"benchlingId": "s1", **METADATA, "bases": "acgtac"},
+        {"benchlingId": "s2", **METADATA, "bases": "gg"},
+    ]
+
+
+def test_fasta_items_with_missing_metadata():
+    items = list(fasta_items(FASTA, [json.dumps(METADATA)] * 2))
+
+    # the unmatched record is kept, without metadata
+    assert len(items) == 3
+    assert json.loads(items[2]) == {"benchlingId": "s3", "bases": "tt"}
+
+
+def test_fasta_items_with_extra_metadata():
+    items = list(fasta_items(FASTA[:5], [json.dumps(METADATA)] * 3))
+
+    assert len(items) == 3
+    assert json.loads(items[2]) == METADATA
+
+
+def test_decoded_spooled_upload():
+    with SpooledTemporaryFile() as upload:
+        upload.write("acgt\n>é\n".encode() + b"\xff\n")
+        upload.seek(0)
+
+        assert list(decoded(upload)) == ["acgt\n", ">é\n", "�\n"]
@@ -0,0 +1,27 @@
+from app.search.kmer import KMER_BLOCK_SIZE, blocks, bucket, encode, extract, kmers
+
+
+def test_encode_two_bits_per_nucleotide():
+    assert encode("acgt") == 0b00011011
+    assert encode("ACGT") == encode("acgt")
+
+
+def test_extract_skips_ambiguous_kmers():
+    assert extract("acgtNacg", 3) == sorted({encode("acg"), encode("cgt")})
+
+
+def test_kmers_tile_unambiguous_segments():
+    assert kmers("acgtacNac", 3) == sorted({encode("acg"), encode("tac")})
+
+
+def test_blocks_hold_each_kmer_once():
+    keys = list(range(KMER_BLOCK_SIZE + 1))
+    rows = list(blocks(1, 12, keys))
+
+    assert [block for _, block, _, _ in rows] == [0, 1]
+    assert sum((row[3] for row in rows), []) == keys
+
+
+def test_bucket_is_prefix():
+    assert bucket(encode("acgtacgtacgt"), 12) == encode("acgtacgtac")
+    assert bucket(encode("acgt"), 4) == encode("acgt")
@@ -0,0 +1,22 @@
+from app.services.packing import EXCEPTIONS, pack, unpack
+
+
+def test_round_trip_preserves_case():
+    for bases in ["", "acgt", "ACGTacgt", "acgTNNnnacgt", "AcGuRYn"]:
+        assert unpack(pack(bases)) == bases
+
+
+def test_sparse_ambiguity_keeps_2bit_encoding():
+    packed = pack("acgt" * 100 + "NNNN" + "acgt" * 100)
+
+    assert packed[0] == 2 | EXCEPTIONS
+    assert len(packed) < 2 + 4 + 9 + 202
+
+
+def test_dense_ambiguity_uses_4bit_encoding():
+    assert pack("acgtnryk")[0] == 4
+
+
+def test_lowercase_without_exceptions():
+    # the header of values without exception runs is unchanged
+    assert pack("acgt") == bytes((2, 0, 0b00011011))
@@ -0,0 +1,47 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import validation
+from app.services.validation import parse_items
+
+CREATOR = {"benchlingId": "ent_1", "name": "User", "handle": "user"}
+
+
+def item(bases: str) -> str:
+    return json.dumps(
+        {
+            "benchlingId": "seq_1",
+            "name": "sequence",
+            "createdAt": "2020-01-01T00:00:00",
+            "bases": bases,
+            "creator": CREATOR,
+        }
+    )
+
+
+def test_parse_items_in_process_without_spooling(monkeypatch):
+    # the spool is only shared with pool processes
+    monkeypatch.setattr(validation, "NamedTemporaryFile", None)
+
+    parsed = parse_items([item("acgtnACGT"), item("acgx"), "{", item("")])
+
+    assert [p and p.bases for p in parsed] == ["acgtnACGT", None, None, ""]
+
+
+def test_parse_items_across_pool_as_in_process():
+    items = [item("acgtnACGT"), item("acgx"), "{", item(""), item("ac") * 2]
+    # escaped bases are not found as-is in the spool
+    items.append(item("acgt").replace('"acgt"', '"\\u0061cgt"'))
+
+    with ThreadPoolExecutor(2) as executor:
+        pooled = parse_items(items, executor)
+
+    assert pooled == parse_items(items)
+    assert [p and p.bases for p in pooled] == [
+        "acgtnACGT",
+        None,
+        None,
+        "",
+        None,
+        "acgt",
+    ]